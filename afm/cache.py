@@ -0,0 +1,181 @@
+import os
+import hashlib
+import tempfile
+import cPickle as pickle
+
+import afm
+
+# bump this number whenever the layout of cached objects changes
+CACHE_FORMAT_VERSION = 4
+
+def get_file_hash(path):
+    """
+    Return the SHA1 hex digest of the content of the file at `path`.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f_in:
+        for chunk in iter(lambda: f_in.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def get_cache_path(cache_dir, prefix, *paths):
+    """
+    Return the path of the cache file in `cache_dir` for the content
+    of the files in `paths`. The file name is keyed by the content
+    hashes, the afm version and the cache format version, so the cache
+    is invalidated automatically when any of them changes.
+    """
+    sha1 = hashlib.sha1()
+    sha1.update('{0}:{1}'.format(afm.__version__, CACHE_FORMAT_VERSION))
+    for path in paths:
+        sha1.update(':' + get_file_hash(path))
+    return os.path.join(cache_dir, '{0}_{1}.pkl'.format(prefix, sha1.hexdigest()))
+
+def load_cache(cache_path):
+    """
+    Return the object pickled at `cache_path`, or ``None`` if the
+    cache file does not exist or cannot be read.
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f_in:
+            return pickle.load(f_in)
+    except Exception:
+        # a stale or corrupted cache is treated as a miss
+        return None
+
+def save_cache(cache_path, obj):
+    """
+    Pickle `obj` to `cache_path`. The file is written to a temporary
+    file first and then renamed, so concurrent readers never see a
+    partially written cache.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    if not os.path.exists(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # created by another process in the meantime
+            if not os.path.isdir(cache_dir):
+                raise
+
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f_out:
+            pickle.dump(obj, f_out, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, cache_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def load_fragment_library_cache(fragment_smiles_path, cache_dir):
+    """
+    Return the list of fragments cached for `fragment_smiles_path`, with
+    their representative species and the library property table attached,
+    or ``None`` on a cache miss.
+    """
+    cache_path = get_cache_path(cache_dir, 'fragment_library', fragment_smiles_path)
+    cached = load_cache(cache_path)
+    if cached is None:
+        return None
+
+    fragments, property_table = cached
+    if property_table is not None:
+        property_table.attach(fragments)
+
+    return fragments
+
+def save_fragment_library_cache(fragment_smiles_path, cache_dir, fragments):
+    """
+    Cache the `fragments` loaded from `fragment_smiles_path` together
+    with their representative species and property table.
+    """
+    cache_path = get_cache_path(cache_dir, 'fragment_library', fragment_smiles_path)
+    property_table = fragments[0].property_table if fragments else None
+    save_cache(cache_path, (fragments, property_table))
+
+def load_chemkin_cache(chemkin_path, dictionary_path, cache_dir):
+    """
+    Return the (species list, reaction list) cached for the Chemkin file
+    at `chemkin_path` and the species dictionary at `dictionary_path`,
+    or ``None`` on a cache miss.
+    """
+    cache_path = get_cache_path(cache_dir, 'chemkin', chemkin_path, dictionary_path)
+    return load_cache(cache_path)
+
+def save_chemkin_cache(chemkin_path, dictionary_path, cache_dir, species_list, reaction_list):
+    """
+    Cache the species and reactions parsed from the Chemkin file at
+    `chemkin_path` and the species dictionary at `dictionary_path`.
+    """
+    cache_path = get_cache_path(cache_dir, 'chemkin', chemkin_path, dictionary_path)
+    save_cache(cache_path, (species_list, reaction_list))
+
+class ResonanceCache(object):
+    """
+    A cache of the resonance structures that fragments react as (see
+    :meth:`Fragment.generate_representative_resonance_structures`),
+    keyed by the canonical fragment key, so that the resonance and
+    aromaticity perception runs once per unique fragment.
+    """
+
+    def __init__(self, structures=None):
+        self.structures = structures or {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.structures)
+
+    def __reduce__(self):
+        """
+        A helper function used when pickling the object.
+        """
+        return (ResonanceCache, (self.structures,))
+
+    def get_resonance_structures(self, fragment):
+        """
+        Return copies of the cached resonance structures of `fragment`,
+        generating and caching them on a miss.
+        """
+        key = fragment.canonical_key
+        molecules = self.structures.get(key)
+        if molecules is None:
+            self.misses += 1
+            molecules = fragment.generate_representative_resonance_structures()
+            self.structures[key] = [mol.copy(deep=True) for mol in molecules]
+            return molecules
+
+        self.hits += 1
+        return [mol.copy(deep=True) for mol in molecules]
+
+    def assign_resonance_structures(self, fragments):
+        """
+        Set the molecules of the representative species of `fragments`
+        to their cached resonance structures, aromatic structure first.
+        """
+        for frag in fragments:
+            frag.assign_representative_species()
+            frag.species_repr.molecule = self.get_resonance_structures(frag)
+
+def load_resonance_cache(fragment_smiles_path, cache_dir):
+    """
+    Return the resonance cache stored next to the fragment library
+    cache of `fragment_smiles_path`, or an empty one on a cache miss.
+    """
+    cache_path = get_cache_path(cache_dir, 'resonance', fragment_smiles_path)
+    resonance_cache = load_cache(cache_path)
+    if resonance_cache is None:
+        return ResonanceCache()
+
+    return resonance_cache
+
+def save_resonance_cache(fragment_smiles_path, cache_dir, resonance_cache):
+    """
+    Store `resonance_cache` next to the fragment library cache
+    of `fragment_smiles_path`.
+    """
+    cache_path = get_cache_path(cache_dir, 'resonance', fragment_smiles_path)
+    save_cache(cache_path, resonance_cache)
@@ -0,0 +1,120 @@
+from rmgpy.thermo import NASA
+from rmgpy.molecule.element import getElement
+from rmgpy.chemkin import getSpeciesIdentifier, markDuplicateReactions, \
+    writeElementsSection, writeKineticsEntry
+
+def get_chemkin_element_counts(fragment):
+    """
+    Return the list of (Chemkin element name, count) pairs of `fragment`,
+    carbon and hydrogen first and then the others alphabetically. The
+    counts are those of the fragment itself, i.e., without the ethyl
+    caps of its representative molecule, which the RMG writer counts.
+    """
+    counts = {}
+    for key, count in fragment.get_element_count().iteritems():
+        if isinstance(key, tuple):
+            name = getElement(key[0], key[1]).chemkinName
+        else:
+            name = key
+        counts[name] = counts.get(name, 0) + count
+
+    names = [name for name in ('C', 'H') if name in counts]
+    names.extend(sorted([name for name in counts if name not in ('C', 'H')]))
+    return [(name, counts[name]) for name in names]
+
+def write_thermo_entry(species, element_counts, verbose=True):
+    """
+    Return the Chemkin NASA entry of `species` with the element counts
+    given as a list of (element name, count) pairs, in the layout of the
+    RMG writer.
+    """
+    thermo = species.getThermoData()
+    if not isinstance(thermo, NASA):
+        raise Exception('Species {0} has no NASA thermo to write.'.format(species.label))
+    if len(thermo.polynomials) != 2:
+        raise Exception('Species {0} does not have exactly two NASA polynomials.'.format(species.label))
+
+    poly_low, poly_high = thermo.polynomials
+
+    string = ''
+    if verbose and thermo.comment:
+        for line in thermo.comment.split('\n'):
+            string += '! {0}\n'.format(line)
+
+    # Line 1
+    string += '{0:<16}        '.format(getSpeciesIdentifier(species))
+    if len(element_counts) <= 4:
+        for name, count in element_counts:
+            string += '{0!s:<2}{1:>3d}'.format(name, count)
+        string += '     ' * (4 - len(element_counts))
+    else:
+        string += '     ' * 4
+    string += 'G{0:<10.3f}{1:<10.3f}{2:<8.2f}      1'.format(poly_low.Tmin.value_si,
+                                                            poly_high.Tmax.value_si,
+                                                            poly_low.Tmax.value_si)
+    if len(element_counts) > 4:
+        # the new-style element counts of Chemkin 4 or later
+        string += '&\n'
+        for name, count in element_counts:
+            string += '{0!s:<2}{1:>3d}'.format(name, count)
+    string += '\n'
+
+    # Lines 2-4
+    string += '{0:< 15.8E}{1:< 15.8E}{2:< 15.8E}{3:< 15.8E}{4:< 15.8E}    2\n'.format(*poly_high.coeffs[0:5])
+    string += '{0:< 15.8E}{1:< 15.8E}{2:< 15.8E}{3:< 15.8E}{4:< 15.8E}    3\n'.format(poly_high.coeffs[5],
+                                                                                 poly_high.coeffs[6],
+                                                                                 poly_low.coeffs[0],
+                                                                                 poly_low.coeffs[1],
+                                                                                 poly_low.coeffs[2])
+    string += '{0:< 15.8E}{1:< 15.8E}{2:< 15.8E}{3:< 15.8E}                   4\n'.format(*poly_low.coeffs[3:7])
+
+    return string
+
+def save_chemkin_file(path, species_list, reaction_list, fragments_dict, verbose=True,
+                      check_for_duplicates=True):
+    """
+    Save a fragment mechanism as a Chemkin file at `path`. The species
+    are labeled by the fragment labels in `fragments_dict`, and their
+    element counts are written from the fragment composition, so no
+    correction of the cutting label caps is needed afterwards. Every
+    section is streamed to the file entry by entry.
+    """
+    if check_for_duplicates:
+        markDuplicateReactions(reaction_list)
+
+    with open(path, 'w') as f_out:
+        writeElementsSection(f_out)
+
+        f_out.write('SPECIES\n')
+        for spec in species_list:
+            label = getSpeciesIdentifier(spec)
+            if verbose:
+                f_out.write('    {0!s:<16}    ! {1}\n'.format(label, str(spec)))
+            else:
+                f_out.write('    {0!s:<16}\n'.format(label))
+        f_out.write('END\n\n\n\n')
+
+        f_out.write('THERM ALL\n')
+        f_out.write('    300.000  1000.000  5000.000\n\n')
+        for spec in species_list:
+            element_counts = get_chemkin_element_counts(fragments_dict[spec.label])
+            f_out.write(write_thermo_entry(spec, element_counts, verbose=verbose))
+            f_out.write('\n')
+        f_out.write('END\n\n\n\n')
+
+        f_out.write('REACTIONS    KCAL/MOLE   MOLES\n\n')
+        for rxn in reaction_list:
+            f_out.write(writeKineticsEntry(rxn, speciesList=species_list, verbose=verbose))
+            f_out.write('\n')
+        f_out.write('END\n\n')
+
+def save_species_dictionary(path, species_list):
+    """
+    Save the representative molecules of `species_list` as an RMG
+    species dictionary at `path`, streamed species by species.
+    """
+    with open(path, 'w') as f_out:
+        for spec in species_list:
+            f_out.write(spec.molecule[0].toAdjacencyList(label=getSpeciesIdentifier(spec),
+                                                         removeH=False))
+            f_out.write('\n')
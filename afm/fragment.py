@@ -1,6 +1,9 @@
 import os
+import re
+import array
 import urllib
 import itertools
+import numpy as np
 
 from rmgpy.species import Species
 import rmgpy.molecule.group as gr
@@ -10,7 +13,7 @@ import rmgpy.molecule.resonance as resonance
 from rmgpy.molecule.element import getElement
 from rmgpy.molecule.graph import Graph, Vertex
 from rmgpy.molecule.molecule import Atom, Bond, Molecule
-from rmgpy.molecule.atomtype import getAtomType, AtomTypeError
+from rmgpy.molecule.atomtype import getAtomType, AtomTypeError, atomTypes
 from rmgpy.molecule.kekulize import kekulize
 
 class CuttingLabel(Vertex):
@@ -38,6 +41,14 @@ class CuttingLabel(Vertex):
         """
         return "<CuttingLabel '{0}'>".format(str(self))
 
+    def __reduce__(self):
+        """
+        A helper function used when pickling a CuttingLabel object. Only
+        the identity of the label is kept; its edges are rebuilt by the
+        fragment it belongs to, see :meth:`Fragment.get_compact_state`.
+        """
+        return (CuttingLabel, (self.name, self.label, self.id))
+
     @property
     def symbol(self): return self.name
 
@@ -134,6 +145,14 @@ class Fragment(Graph):
         self.fingerprint = None
         self.inchi = None
         self.smiles = None
+        self._smiles_like = None
+        self._canonical_key = None
+        self._repr_mapping = None
+        self._species_mol_repr = None
+        self._aromatic_rings = None
+        self._prefilter_mask = None
+        self.property_table = None
+        self.library_id = -1
         self.props = props or {}
         self.multiplicity = multiplicity
         self.reactive = reactive
@@ -145,7 +164,8 @@ class Fragment(Graph):
             self.inchi = InChI
         elif SMILES:
             self.from_SMILES_like_string(SMILES)
-            self.smiles = SMILES
+            # keep the labeled input, see to_SMILES_like_string
+            self._smiles_like = SMILES
 
     def __str__(self):
         """
@@ -154,10 +174,24 @@ class Fragment(Graph):
         if self.index == -1: return self.label
         else: return '{0}({1:d})'.format(self.label, self.index)
 
+    def __reduce__(self):
+        """
+        A helper function used when pickling a Fragment object. The
+        fragment is sent as its compact state, see :meth:`get_compact_state`.
+        """
+        return (fragment_from_compact_state, (self.get_compact_state(),))
+
     def __getAtoms(self): return self.vertices
     def __setAtoms(self, atoms): self.vertices = atoms
     atoms = property(__getAtoms, __setAtoms)
 
+    def __getFingerprint(self):
+        if self._fingerprint is None:
+            self.updateFingerprint()
+        return self._fingerprint
+    def __setFingerprint(self, fingerprint): self._fingerprint = fingerprint
+    fingerprint = property(__getFingerprint, __setFingerprint)
+
     def draw(self, path):
         """
         Generate a pictorial representation of the chemical graph using the
@@ -245,16 +279,43 @@ class Fragment(Graph):
 
     @property
     def SMILES(self):
-        """SMILES string for this molecule. Read-only."""
-        if self.smiles is None:
-            self.smiles = self.toSMILES()
-        return self.smiles
+        """
+        SMILES-like string for this fragment, with the cutting labels
+        written by their names, e.g., the `SMILES` it was created with.
+        Read-only.
+        """
+        return self.to_SMILES_like_string()
+
+    @property
+    def canonical_key(self):
+        """Canonical string key for this fragment. Read-only."""
+        if self._canonical_key is None:
+            self._canonical_key = self.to_canonical_key()
+        return self._canonical_key
+
+    def resetCachedStructureInfo(self):
+        """
+        Reset the cached structure information, i.e., fingerprint,
+        canonical key, SMILES and SMILES-like strings, representative
+        molecule, aromatic rings and the link to the library property
+        table, which need to be regenerated after the graph is changed.
+        """
+        self.fingerprint = None
+        self._canonical_key = None
+        self.smiles = None
+        self._smiles_like = None
+        self._repr_mapping = None
+        self._aromatic_rings = None
+        self._prefilter_mask = None
+        # properties in the library table are no longer valid
+        self.property_table = None
+        self.library_id = -1
 
     def addAtom(self, atom):
         """
         Add an `atom` to the graph. The atom is initialized with no bonds.
         """
-        self.fingerprint = None
+        self.resetCachedStructureInfo()
         return self.addVertex(atom)
 
     def removeAtom(self, atom):
@@ -263,7 +324,7 @@ class Fragment(Graph):
         not remove atoms that no longer have any bonds as a result of this
         removal.
         """
-        self.fingerprint = None
+        self.resetCachedStructureInfo()
         return self.removeVertex(atom)
 
     def containsSurfaceSite(self):
@@ -297,7 +358,7 @@ class Fragment(Graph):
         Add a `bond` to the graph as an edge connecting the two atoms `atom1`
         and `atom2`.
         """
-        self.fingerprint = None
+        self.resetCachedStructureInfo()
         return self.addEdge(bond)
 
     def removeBond(self, bond):
@@ -306,9 +367,80 @@ class Fragment(Graph):
         Does not remove atoms that no longer have any bonds as a result of
         this removal.
         """
-        self.fingerprint = None
+        self.resetCachedStructureInfo()
         return self.removeEdge(bond)
 
+    def get_compact_state(self):
+        """
+        Return a compact, picklable representation of the fragment, used
+        for multiprocessing and on-disk caches. Vertices are encoded as an
+        array of codes, the atomic number for atoms and ``-(k+1)`` for the
+        k-th cutting label name in `label_names`, together with per-vertex
+        attribute arrays; bonds as a flat array of vertex index pairs and
+        an array of bond orders. :func:`fragment_from_compact_state`
+        rebuilds an identical fragment.
+        """
+        vertex_index = {}
+        label_names = []
+        codes = array.array('h')
+        isotopes = array.array('h')
+        radicals = array.array('b')
+        charges = array.array('b')
+        lone_pairs = array.array('b')
+        atom_types = []
+        atom_labels = []
+        ids = array.array('i')
+        for idx, vertex in enumerate(self.vertices):
+            vertex_index[vertex] = idx
+            if isinstance(vertex, CuttingLabel):
+                if vertex.name not in label_names:
+                    label_names.append(vertex.name)
+                codes.append(-label_names.index(vertex.name) - 1)
+                isotopes.append(-1)
+                radicals.append(0)
+                charges.append(0)
+                lone_pairs.append(0)
+                atom_types.append(None)
+            else:
+                codes.append(vertex.element.number)
+                isotopes.append(vertex.element.isotope)
+                radicals.append(vertex.radicalElectrons)
+                charges.append(vertex.charge)
+                lone_pairs.append(int(vertex.lonePairs))
+                atom_types.append(vertex.atomType.label if vertex.atomType is not None else None)
+            atom_labels.append(vertex.label)
+            ids.append(vertex.id)
+
+        bond_pairs = array.array('i')
+        bond_orders = array.array('d')
+        for vertex1, idx1 in vertex_index.iteritems():
+            for vertex2, bond in vertex1.edges.iteritems():
+                idx2 = vertex_index[vertex2]
+                if idx1 < idx2:
+                    bond_pairs.extend((idx1, idx2))
+                    bond_orders.append(bond.order)
+
+        return {
+            'label': self.label,
+            'species_repr': self.species_repr,
+            'symmetryNumber': self.symmetryNumber,
+            'multiplicity': self.multiplicity,
+            'reactive': self.reactive,
+            'props': self.props,
+            'canonical_key': self._canonical_key,
+            'label_names': tuple(label_names),
+            'codes': codes,
+            'isotopes': isotopes,
+            'radicals': radicals,
+            'charges': charges,
+            'lone_pairs': lone_pairs,
+            'atom_types': tuple(atom_types),
+            'atom_labels': tuple(atom_labels),
+            'ids': ids,
+            'bond_pairs': bond_pairs,
+            'bond_orders': bond_orders,
+        }
+
     def getNetCharge(self):
         """
         Iterate through the atoms in the structure and calculate the net charge
@@ -381,28 +513,17 @@ class Fragment(Graph):
         return self
 
     def from_SMILES_like_string(self, SMILES_like_string):
-
-        import re
-        smiles = SMILES_like_string
-
-        cutting_label_list = re.findall(r'([LR]\d?)', smiles)
-
-        smiles_replace_dict = {}
-        metal_list = ['[Na]', '[K]', '[Cs]', '[Fr]', '[Be]', '[Mg]', '[Ca]', '[Sr]', '[Ba]']
-        for index, label_str in enumerate(cutting_label_list):
-            smiles_replace_dict[label_str] = metal_list[index]
-
-        atom_replace_dict = {}
-        for key, value in smiles_replace_dict.iteritems():
-            atom_replace_dict[value] = key
-
-        for label_str, element in smiles_replace_dict.iteritems():
-            smiles = smiles.replace(label_str, element)
-
+        """
+        Convert a SMILES-like string, i.e., a SMILES string in which
+        cutting labels such as 'R', 'L' or 'R1' stand for atoms, to a
+        fragment. Each cutting label is tokenized into a dummy atom whose
+        isotope encodes its name (see :func:`to_labeled_SMILES`), so there
+        is no limit on the number of cutting labels.
+        """
         from rdkit import Chem
-        rdkitmol = Chem.MolFromSmiles(smiles)
 
-        self.fromRDKitMol(rdkitmol, atom_replace_dict)
+        rdkitmol = Chem.MolFromSmiles(to_labeled_SMILES(SMILES_like_string))
+        self.fromRDKitMol(rdkitmol)
 
         return self
 
@@ -426,7 +547,7 @@ class Fragment(Graph):
         if not isinstance(other, Graph):
             raise TypeError('Got a {0} object for parameter "other", when a Molecule object is required.'.format(other.__class__))
         # Do the quick isomorphism comparison using the fingerprint
-        # Two fingerprint strings matching is a necessary (but not
+        # Two fingerprints matching is a necessary (but not
         # sufficient!) condition for the associated molecules to be isomorphic
         if self.fingerprint != other.fingerprint:
             return False
@@ -461,24 +582,35 @@ class Fragment(Graph):
             raise TypeError('Got a {0} object for parameter "other", when a Molecule object is required.'.format(other.__class__))
         group = other
 
-        mapping = self.assign_representative_molecule()
-
-        # Check multiplicity
-        if group.multiplicity:
-            if self.mol_repr.multiplicity not in group.multiplicity: return False
+        group_idx = None
+        if group_prefilter_index is not None:
+            group_idx = group_prefilter_index.group_index.get(id(group))
 
-        # Compare radical counts
-        if self.mol_repr.getRadicalCount() < group.radicalCount:
-            return False
-
-        # Compare element counts
-        element_count = self.mol_repr.get_element_count()
-        for element, count in group.elementCount.iteritems():
-            if element not in element_count:
+        if group_idx is not None:
+            # the library-wide index covers the checks below
+            if not group_prefilter_index.get_mask(self)[group_idx]:
                 return False
-            elif element_count[element] < count:
+        else:
+            # Check multiplicity, the representative molecule has
+            # the same radicals as the fragment
+            radical_count = self.getRadicalCount()
+            if group.multiplicity:
+                if radical_count + 1 not in group.multiplicity: return False
+
+            # Compare radical counts
+            if radical_count < group.radicalCount:
                 return False
 
+            # Compare element counts
+            element_count = self.get_representative_element_count()
+            for element, count in group.elementCount.iteritems():
+                if element not in element_count:
+                    return False
+                elif element_count[element] < count:
+                    return False
+
+        mapping = self.assign_representative_molecule()
+
         # Do the isomorphism comparison
         new_initial_map = None
         if initialMap:
@@ -491,6 +623,16 @@ class Fragment(Graph):
         return result
 
     def assign_representative_molecule(self):
+        """
+        Assign `mol_repr`, a molecule made by capping every cutting label
+        with an ethyl group, and return the mapping from fragment vertices
+        to the copied vertices. The result is memoized until the graph is
+        changed, see :meth:`resetCachedStructureInfo`.
+        """
+        if self._repr_mapping is not None:
+            representative_cache_info['hits'] += 1
+            return self._repr_mapping
+        representative_cache_info['misses'] += 1
 
         # create a molecule from fragment.vertices.copy
         mapping = self.copyAndMap()
@@ -577,18 +719,34 @@ class Fragment(Graph):
 
         # create a species object from molecule
         self.mol_repr = mol_repr
+        self._repr_mapping = mapping
 
         return mapping
 
     def assign_representative_species(self):
-
+        """
+        Assign `species_repr`, a species of the representative molecule
+        `mol_repr`. The species is reused as long as it wraps the current
+        `mol_repr`; otherwise it is rebuilt, keeping the label and thermo
+        of the previous species, e.g., of a fragment restored from its
+        compact state, whose `mol_repr` is not restored.
+        """
         self.assign_representative_molecule()
-        self.species_repr = Species(molecule=[self.mol_repr])
+        if self.species_repr is None or self._species_mol_repr is not self.mol_repr:
+            species = Species(molecule=[self.mol_repr])
+            if self.species_repr is not None:
+                species.label = self.species_repr.label
+                species.thermo = self.species_repr.thermo
+            self.species_repr = species
+            self._species_mol_repr = self.mol_repr
 
     def getMolecularWeight(self):
         """
         Return the fragmental weight of the fragment in kg/mol.
         """
+        if self.property_table is not None:
+            return self.property_table.molecular_weights[self.library_id]
+
         mass = 0
         for vertex in self.vertices:
             if isinstance(vertex, Atom):
@@ -607,6 +765,7 @@ class Fragment(Graph):
 
     def update(self):
 
+        self.resetCachedStructureInfo()
         for v in self.vertices:
             if isinstance(v, Atom):
                 v.updateCharge()
@@ -614,6 +773,35 @@ class Fragment(Graph):
         self.updateAtomTypes()
         self.updateMultiplicity()
         self.sortVertices()
+        self.updateFingerprint()
+
+    def updateFingerprint(self):
+        """
+        Update the fingerprint of the fragment, a tuple of element counts,
+        cutting label counts, radical count and vertex degree histogram.
+        Two fingerprints matching is a necessary (but not sufficient!)
+        condition for the associated fragments to be isomorphic.
+        """
+        element_count = {}
+        cutting_label_count = {}
+        degree_count = {}
+        radical_count = 0
+        for vertex in self.vertices:
+            if isinstance(vertex, CuttingLabel):
+                cutting_label_count[vertex.name] = cutting_label_count.get(vertex.name, 0) + 1
+            else:
+                symbol = vertex.element.symbol
+                isotope = vertex.element.isotope
+                key = symbol if isotope == -1 else '{0}{1}'.format(isotope, symbol)
+                element_count[key] = element_count.get(key, 0) + 1
+            radical_count += vertex.radicalElectrons
+            degree = len(vertex.edges)
+            degree_count[degree] = degree_count.get(degree, 0) + 1
+
+        self._fingerprint = (tuple(sorted(element_count.items())),
+                             tuple(sorted(cutting_label_count.items())),
+                             radical_count,
+                             tuple(sorted(degree_count.items())))
 
     def updateAtomTypes(self, logSpecies=True, raiseException=True):
         """
@@ -669,36 +857,16 @@ class Fragment(Graph):
         """
         Return the molecular formula for the fragment.
         """
-        
+        if self.property_table is not None:
+            return self.property_table.formulas[self.library_id]
+
         # Count the number of each element in the molecule
         elements = {}
-        cuttinglabels = {}
         for atom in self.vertices:
             symbol = atom.symbol
             elements[symbol] = elements.get(symbol, 0) + 1
-        
-        # Use the Hill system to generate the formula
-        formula = ''
-        
-        # Carbon and hydrogen always come first if carbon is present
-        if 'C' in elements.keys():
-            count = elements['C']
-            formula += 'C{0:d}'.format(count) if count > 1 else 'C'
-            del elements['C']
-            if 'H' in elements.keys():
-                count = elements['H']
-                formula += 'H{0:d}'.format(count) if count > 1 else 'H'
-                del elements['H']
-
-        # Other atoms are in alphabetical order
-        # (This includes hydrogen if carbon is not present)
-        keys = elements.keys()
-        keys.sort()
-        for key in keys:
-            count = elements[key]
-            formula += '{0}{1:d}'.format(key, count) if count > 1 else key
-        
-        return formula
+
+        return get_formula_from_counts(elements)
 
     def get_representative_molecule(self, mode='minimal', update=True):
 
@@ -812,7 +980,9 @@ class Fragment(Graph):
         self.vertices, self.multiplicity = fromAdjacencyList(adjlist, 
                                                              group=False, 
                                                              saturateH=saturateH)
+        self.resetCachedStructureInfo()
         self.updateAtomTypes()
+        self.updateFingerprint()
         
         # Check if multiplicity is possible
         n_rad = self.getRadicalCount() 
@@ -833,14 +1003,25 @@ class Fragment(Graph):
 
         The method currently restricts aromaticity to six-membered carbon-only rings. This is a limitation imposed
         by RMG, and not by RDKit.
+
+        If `rings` is not given, the result is memoized as long as the atoms,
+        radicals and bond orders of the fragment are unchanged.
         """
+        if rings is None:
+            state = self.get_aromaticity_state()
+            if self._aromatic_rings is not None and self._aromatic_rings[0] == state:
+                return self._aromatic_rings[1]
+
+            rings = self.getRelevantCycles()
+            rings = [ring for ring in rings if len(ring) == 6]
+            result = self.getAromaticRings(rings) if rings else ([], [])
+            if result is not None:
+                self._aromatic_rings = (state, result)
+            return result
 
         from rdkit.Chem.rdchem import BondType
         AROMATIC = BondType.AROMATIC
 
-        if rings is None:
-            rings = self.getRelevantCycles()
-            rings = [ring for ring in rings if len(ring) == 6]
         if not rings:
             return [], []
 
@@ -870,6 +1051,22 @@ class Fragment(Graph):
 
             return aromaticRings, aromaticBonds
 
+    def get_aromaticity_state(self):
+        """
+        Return a tuple of the vertices with their radicals and of the bonds
+        with their orders, which determines the aromaticity perceived for
+        the fragment. Bond orders can be changed in place, e.g., by resonance
+        algorithms, so the memoized aromatic rings are validated against this
+        state. The state is sorted, so it does not depend on the order of the
+        vertices, which e.g. :meth:`toRDKitMol` changes.
+        """
+        vertex_state = sorted([(id(vertex), vertex.radicalElectrons) for vertex in self.vertices])
+        bond_state = sorted([(min(id(bond.vertex1), id(bond.vertex2)),
+                              max(id(bond.vertex1), id(bond.vertex2)),
+                              bond.order)
+                             for bond in self.getAllEdges()])
+        return tuple(vertex_state), tuple(bond_state)
+
     def isAromatic(self):
         """ 
         Returns ``True`` if the fragment is aromatic, or ``False`` if not.  
@@ -914,6 +1111,21 @@ class Fragment(Graph):
         return resonance.generate_resonance_structures(self, keep_isomorphic=keep_isomorphic,
                                                         filter_structures = filter_structures)
 
+    def generate_representative_resonance_structures(self):
+        """
+        Return the resonance structures of the representative species
+        that the fragment reacts as: the first aromatic structure alone
+        if there is one, or all the resonance structures otherwise.
+        """
+        self.assign_representative_species()
+        species = self.species_repr
+        species.generate_resonance_structures()
+        for mol in species.molecule:
+            if mol.isAromatic():
+                return [mol]
+
+        return list(species.molecule)
+
     def isIdentical(self, other, strict=True):
         """
         Performs isomorphism checking, with the added constraint that atom IDs must match.
@@ -947,48 +1159,71 @@ class Fragment(Graph):
             return False
 
     def toSMILES(self):
+        """
+        Return the canonical SMILES of the fragment with every cutting
+        label replaced by a hydrogen, written from the compact form of
+        the fragment. The result is memoized until the graph is changed.
+        """
+        if self.smiles is None:
+            self.smiles = CompactFragment.from_fragment(self).toSMILES()
+        return self.smiles
 
-        cutting_label_list = []
-        for vertex in self.vertices:
-            if isinstance(vertex, CuttingLabel):
-                cutting_label_list.append(vertex.symbol)
+    def to_SMILES_like_string(self):
+        """
+        Return the SMILES-like string of the fragment, in which every
+        cutting label is written by its name, e.g., 'RCCL'. It can be
+        read back with :meth:`from_SMILES_like_string`. A fragment created
+        with a `SMILES` string returns that string, otherwise the canonical
+        string is written. The result is memoized until the graph is changed.
+        """
+        if self._smiles_like is None:
+            from rdkit import Chem
 
-        SMILES_before = self.copy(deep=True)
-        final_vertices = []
-        for ind, atom in enumerate(SMILES_before.atoms):
-            element_symbol = atom.symbol
-            if isinstance(atom, CuttingLabel):
-                substi_name = 'Si'
-                substi = Atom(element=substi_name)
-                substi.label = element_symbol
+            rdmol, _ = self.to_labeled_RDKit_mol()
+            self._smiles_like = from_labeled_SMILES(Chem.MolToSmiles(rdmol, isomericSmiles=True))
+        return self._smiles_like
 
-                for bondedAtom, bond in atom.edges.iteritems():
-                    new_bond = Bond(bondedAtom, substi, order=bond.order)
+    def to_canonical_key(self):
+        """
+        Return a canonical string key of the fragment, which is the RDKit
+        canonical SMILES with every cutting label written as a dummy atom
+        tagged by its name, followed by the multiplicity.
 
-                    bondedAtom.edges[substi] = new_bond
-                    del bondedAtom.edges[atom]
+        Isomorphic fragments always share the same key, so the key can be
+        used to bucket fragments before running full isomorphism checks.
+        """
+        from rdkit import Chem
 
-                    substi.edges[bondedAtom] = new_bond
+        rdmol, _ = self.to_labeled_RDKit_mol()
+        smiles = Chem.MolToSmiles(rdmol, isomericSmiles=True)
 
-                substi.radicalElectrons = 3
+        return '{0}|{1}'.format(smiles, self.multiplicity)
 
-                final_vertices.append(substi)
-            else:
-                final_vertices.append(atom)
+    def to_labeled_RDKit_mol(self):
+        """
+        Convert the fragment to a RDKit rdmol object in which every
+        cutting label is kept as a dummy atom whose isotope encodes the
+        label name (see :func:`get_cutting_label_isotope`). Terminal
+        hydrogens are folded into their heavy atoms as explicit H counts.
 
-        SMILES_before.vertices = final_vertices
-        mol_repr = Molecule()
-        mol_repr.atoms = SMILES_before.vertices
-        SMILES_after = mol_repr.toSMILES()
-        import re
-        smiles = re.sub('\[Si\]', '', SMILES_after)
+        Returns the rdmol and a dictionary mapping fragment vertices
+        to rdmol atom indices (folded hydrogens are not mapped).
+        """
+        rdmol = CompactFragment.from_fragment(self).to_labeled_RDKit_mol()
+
+        # CompactFragment keeps the unfolded vertices in their order
+        kept_vertices = [vertex for vertex in self.vertices if not is_foldable_hydrogen(vertex)]
+        rdAtomIdx = dict([(vertex, idx) for idx, vertex in enumerate(kept_vertices)])
 
-        return smiles
+        return rdmol, rdAtomIdx
 
     def get_element_count(self):
         """
         Returns the element count for the fragment as a dictionary.
         """
+        if self.property_table is not None:
+            return self.property_table.get_element_count(self.library_id)
+
         element_count = {}
         for atom in self.vertices:
             if not isinstance(atom, Atom): continue
@@ -1002,6 +1237,32 @@ class Fragment(Graph):
 
         return element_count
 
+    def get_representative_element_count(self):
+        """
+        Returns the element count of the representative molecule, i.e.,
+        the fragment with every cutting label capped by an ethyl group,
+        without building it.
+        """
+        element_count = self.get_element_count()
+        num_labels = sum(self.get_cutting_label_count().values())
+        if num_labels:
+            element_count['C'] = element_count.get('C', 0) + 2*num_labels
+            element_count['H'] = element_count.get('H', 0) + 5*num_labels
+
+        return element_count
+
+    def get_cutting_label_count(self):
+        """
+        Returns the cutting label count for the fragment as a dictionary
+        with label names, e.g., 'R' and 'L', as keys.
+        """
+        cutting_label_count = {}
+        for vertex in self.vertices:
+            if isinstance(vertex, CuttingLabel):
+                cutting_label_count[vertex.name] = cutting_label_count.get(vertex.name, 0) + 1
+
+        return cutting_label_count
+
     def getURL(self):
         """
         Get a URL to the fragment's info page on the RMG website.
@@ -1136,25 +1397,31 @@ class Fragment(Graph):
 
             # Use atomic number as key for element
             number = rdkitatom.GetAtomicNum()
-            element = getElement(number)
 
             # Process charge
             charge = rdkitatom.GetFormalCharge()
             radicalElectrons = rdkitatom.GetNumRadicalElectrons()
 
-            ELE = element.symbol
-            if atom_replace_dict.has_key('[' + ELE + ']'):
-                cutting_label_name = atom_replace_dict['[' + ELE + ']']
+            if number == 0:
+                # dummy atom tokenized from a cutting label
+                cutting_label_name = get_cutting_label_name(rdkitatom.GetIsotope())
                 cutting_label = CuttingLabel(name=cutting_label_name)
                 self.vertices.append(cutting_label)
             else:
-                atom = Atom(element, radicalElectrons, charge, '', 0)
-                self.vertices.append(atom)
+                element = getElement(number)
+                ELE = element.symbol
+                if atom_replace_dict and atom_replace_dict.has_key('[' + ELE + ']'):
+                    cutting_label_name = atom_replace_dict['[' + ELE + ']']
+                    cutting_label = CuttingLabel(name=cutting_label_name)
+                    self.vertices.append(cutting_label)
+                else:
+                    atom = Atom(element, radicalElectrons, charge, '', 0)
+                    self.vertices.append(atom)
 
-            # Add bonds by iterating again through atoms
-            for j in xrange(0, i):
-                rdkitbond = rdkitmol.GetBondBetweenAtoms(i, j)
-                if rdkitbond is not None:
+            # Add bonds to the atoms already added
+            for rdkitbond in rdkitatom.GetBonds():
+                j = rdkitbond.GetOtherAtomIdx(i)
+                if j < i:
                     order = 0
 
                     # Process bond type
@@ -1184,6 +1451,544 @@ class Fragment(Graph):
 
         return self
 
+class CompactFragment(object):
+    """
+    A memory-light, array-backed form of a :class:`Fragment` for large
+    fragment libraries. Terminal hydrogens are folded into per-atom
+    hydrogen counts and the remaining vertices are stored as NumPy arrays:
+
+    =================== ========================================================
+    Attribute           Description
+    =================== ========================================================
+    `label`             The fragment label
+    `label_names`       A tuple of the cutting label names in the fragment
+    `codes`             int8 vertex codes, the atomic number for atoms and
+                        ``-(k+1)`` for the k-th name in `label_names`
+    `isotopes`          int16 isotopes, -1 for the natural abundance
+    `hydrogen_counts`   int8 numbers of folded hydrogens per vertex
+    `radicals`          int8 radical electrons per vertex
+    `charges`           int8 formal charges per vertex
+    `indptr`            int32 CSR row pointers of the adjacency
+    `indices`           int32 CSR neighbor indices of the adjacency
+    `bond_orders`       float32 bond orders parallel to `indices`
+    `multiplicity`      The multiplicity of the fragment
+    =================== ========================================================
+
+    The class provides the property getters of :class:`Fragment` used by
+    the library property table and the simulators, so it can stand in
+    for a fragment there. :meth:`to_fragment` rebuilds a full fragment.
+    """
+
+    __slots__ = ('label', 'label_names', 'codes', 'isotopes', 'hydrogen_counts',
+                 'radicals', 'charges', 'indptr', 'indices', 'bond_orders',
+                 'multiplicity', 'property_table', 'library_id',
+                 '_canonical_key', '_molecular_weight', '_smiles')
+
+    def __init__(self, label='', label_names=(), codes=None, isotopes=None,
+                 hydrogen_counts=None, radicals=None, charges=None,
+                 indptr=None, indices=None, bond_orders=None, multiplicity=-187):
+        num_vertices = len(codes) if codes is not None else 0
+        self.label = label
+        self.label_names = tuple(label_names)
+        self.codes = np.asarray(codes if codes is not None else [], dtype=np.int8)
+        self.isotopes = (np.asarray(isotopes, dtype=np.int16) if isotopes is not None
+                         else -np.ones(num_vertices, dtype=np.int16))
+        self.hydrogen_counts = (np.asarray(hydrogen_counts, dtype=np.int8) if hydrogen_counts is not None
+                                else np.zeros(num_vertices, dtype=np.int8))
+        self.radicals = (np.asarray(radicals, dtype=np.int8) if radicals is not None
+                         else np.zeros(num_vertices, dtype=np.int8))
+        self.charges = (np.asarray(charges, dtype=np.int8) if charges is not None
+                        else np.zeros(num_vertices, dtype=np.int8))
+        self.indptr = (np.asarray(indptr, dtype=np.int32) if indptr is not None
+                       else np.zeros(num_vertices + 1, dtype=np.int32))
+        self.indices = np.asarray(indices if indices is not None else [], dtype=np.int32)
+        self.bond_orders = np.asarray(bond_orders if bond_orders is not None else [], dtype=np.float32)
+        if multiplicity == -187:
+            multiplicity = int(self.radicals.sum()) + 1
+        self.multiplicity = multiplicity
+        self.property_table = None
+        self.library_id = -1
+        self._canonical_key = None
+        self._molecular_weight = None
+        self._smiles = None
+
+    def __getstate__(self):
+        """
+        Used for pickling; the link to the property table is dropped.
+        """
+        return (self.label, self.label_names, self.codes, self.isotopes,
+                self.hydrogen_counts, self.radicals, self.charges, self.indptr,
+                self.indices, self.bond_orders, self.multiplicity,
+                self._canonical_key)
+
+    def __setstate__(self, state):
+        """
+        Used for unpickling.
+        """
+        (self.label, self.label_names, self.codes, self.isotopes,
+         self.hydrogen_counts, self.radicals, self.charges, self.indptr,
+         self.indices, self.bond_orders, self.multiplicity,
+         self._canonical_key) = state
+        self.property_table = None
+        self.library_id = -1
+        self._molecular_weight = None
+        self._smiles = None
+
+    def __str__(self):
+        return self.label
+
+    def __repr__(self):
+        return '<CompactFragment "{0}">'.format(self.label)
+
+    def __len__(self):
+        """
+        Return the number of vertices, without the folded hydrogens.
+        """
+        return len(self.codes)
+
+    @classmethod
+    def from_fragment(cls, fragment):
+        """
+        Return the compact form of `fragment`. The vertices kept are
+        those of `fragment` that are not folded hydrogens, in order.
+        """
+        vertex_index = {}
+        label_names = []
+        codes = []
+        isotopes = []
+        hydrogen_counts = []
+        radicals = []
+        charges = []
+        folded_hydrogens = []
+        for vertex in fragment.vertices:
+            if is_foldable_hydrogen(vertex):
+                folded_hydrogens.append(vertex)
+                continue
+            vertex_index[vertex] = len(codes)
+            if isinstance(vertex, CuttingLabel):
+                if vertex.name not in label_names:
+                    label_names.append(vertex.name)
+                codes.append(-label_names.index(vertex.name) - 1)
+                isotopes.append(-1)
+                radicals.append(0)
+                charges.append(0)
+            else:
+                codes.append(vertex.element.number)
+                isotopes.append(vertex.element.isotope)
+                radicals.append(vertex.radicalElectrons)
+                charges.append(vertex.charge)
+            hydrogen_counts.append(0)
+
+        for hydrogen in folded_hydrogens:
+            hydrogen_counts[vertex_index[hydrogen.edges.keys()[0]]] += 1
+
+        indptr = [0]
+        indices = []
+        bond_orders = []
+        for vertex in fragment.vertices:
+            if vertex not in vertex_index:
+                continue
+            neighbors = []
+            for neighbor, bond in vertex.edges.iteritems():
+                if neighbor in vertex_index:
+                    neighbors.append((vertex_index[neighbor], bond.order))
+            neighbors.sort()
+            indices.extend([idx for idx, _ in neighbors])
+            bond_orders.extend([order for _, order in neighbors])
+            indptr.append(len(indices))
+
+        compact = cls(label=fragment.label,
+                      label_names=label_names,
+                      codes=codes,
+                      isotopes=isotopes,
+                      hydrogen_counts=hydrogen_counts,
+                      radicals=radicals,
+                      charges=charges,
+                      indptr=indptr,
+                      indices=indices,
+                      bond_orders=bond_orders,
+                      multiplicity=fragment.multiplicity)
+        compact._canonical_key = fragment._canonical_key
+
+        return compact
+
+    def to_fragment(self):
+        """
+        Rebuild a full :class:`Fragment` with explicit hydrogens and
+        updated atom types.
+        """
+        vertices = []
+        for idx, code in enumerate(self.codes):
+            if code < 0:
+                vertex = CuttingLabel(name=self.label_names[-code - 1])
+            else:
+                vertex = Atom(element=getElement(int(code), int(self.isotopes[idx])),
+                              radicalElectrons=int(self.radicals[idx]),
+                              charge=int(self.charges[idx]),
+                              label='',
+                              lonePairs=0)
+            vertices.append(vertex)
+
+        fragment = Fragment(label=self.label, vertices=list(vertices))
+        for idx1 in xrange(len(vertices)):
+            for ptr in xrange(self.indptr[idx1], self.indptr[idx1 + 1]):
+                idx2 = self.indices[ptr]
+                if idx1 < idx2:
+                    fragment.addEdge(Bond(vertices[idx1], vertices[idx2], float(self.bond_orders[ptr])))
+
+        for idx, count in enumerate(self.hydrogen_counts):
+            for _ in xrange(count):
+                hydrogen = Atom(element=getElement(1), radicalElectrons=0, charge=0, label='', lonePairs=0)
+                fragment.addVertex(hydrogen)
+                fragment.addEdge(Bond(vertices[idx], hydrogen, 1))
+
+        fragment.updateAtomTypes()
+        fragment.multiplicity = self.multiplicity
+        fragment._canonical_key = self._canonical_key
+
+        return fragment
+
+    @property
+    def canonical_key(self):
+        """Canonical string key for this fragment. Read-only."""
+        if self._canonical_key is None:
+            self._canonical_key = self.to_canonical_key()
+        return self._canonical_key
+
+    def toSMILES(self):
+        """
+        Return the canonical SMILES of the fragment with every cutting
+        label replaced by a hydrogen. The result is memoized.
+        """
+        if self._smiles is None:
+            from rdkit import Chem
+
+            rdmol = self.to_labeled_RDKit_mol(hydrogen_caps=True)
+            self._smiles = Chem.MolToSmiles(rdmol, isomericSmiles=True)
+        return self._smiles
+
+    def to_canonical_key(self):
+        """
+        Return the canonical string key of the fragment, identical to
+        :meth:`Fragment.to_canonical_key` of the full fragment.
+        """
+        from rdkit import Chem
+
+        rdmol = self.to_labeled_RDKit_mol()
+        smiles = Chem.MolToSmiles(rdmol, isomericSmiles=True)
+
+        return '{0}|{1}'.format(smiles, self.multiplicity)
+
+    def to_labeled_RDKit_mol(self, hydrogen_caps=False):
+        """
+        Convert the fragment to a RDKit rdmol object, in which the atom
+        indices are the vertex indices, see
+        :meth:`Fragment.to_labeled_RDKit_mol`.
+
+        If `hydrogen_caps` is ``True``, cutting labels are left out and
+        replaced by hydrogens on their neighbors instead, so the atom
+        indices are those of the remaining vertices.
+        """
+        from rdkit import Chem
+
+        hydrogen_counts = self.hydrogen_counts.astype(np.int32)
+        if hydrogen_caps:
+            for idx in np.flatnonzero(self.codes < 0):
+                for ptr in xrange(self.indptr[idx], self.indptr[idx + 1]):
+                    hydrogen_counts[self.indices[ptr]] += int(self.bond_orders[ptr])
+
+        rdmol = Chem.RWMol()
+        rdAtomIndices = -np.ones(len(self.codes), dtype=np.int32)
+        for idx, code in enumerate(self.codes):
+            if code < 0:
+                if hydrogen_caps:
+                    continue
+                rdatom = Chem.Atom(0)
+                rdatom.SetIsotope(get_cutting_label_isotope(self.label_names[-code - 1]))
+            else:
+                rdatom = Chem.Atom(int(code))
+                if self.isotopes[idx] != -1:
+                    rdatom.SetIsotope(int(self.isotopes[idx]))
+                rdatom.SetNumRadicalElectrons(int(self.radicals[idx]))
+                rdatom.SetFormalCharge(int(self.charges[idx]))
+            rdatom.SetNumExplicitHs(int(hydrogen_counts[idx]))
+            rdatom.SetNoImplicit(True)
+            rdAtomIndices[idx] = rdmol.AddAtom(rdatom)
+
+        for idx1 in xrange(len(self.codes)):
+            for ptr in xrange(self.indptr[idx1], self.indptr[idx1 + 1]):
+                idx2 = int(self.indices[ptr])
+                if idx2 < idx1 or rdAtomIndices[idx1] < 0 or rdAtomIndices[idx2] < 0:
+                    continue
+                rdIdx1 = int(rdAtomIndices[idx1])
+                rdIdx2 = int(rdAtomIndices[idx2])
+                order = self.bond_orders[ptr]
+                if order == 1.5:
+                    rdmol.GetAtomWithIdx(rdIdx1).SetIsAromatic(True)
+                    rdmol.GetAtomWithIdx(rdIdx2).SetIsAromatic(True)
+                    rdmol.AddBond(rdIdx1, rdIdx2, Chem.BondType.AROMATIC)
+                    rdmol.GetBondBetweenAtoms(rdIdx1, rdIdx2).SetIsAromatic(True)
+                elif order == 2:
+                    rdmol.AddBond(rdIdx1, rdIdx2, Chem.BondType.DOUBLE)
+                elif order == 3:
+                    rdmol.AddBond(rdIdx1, rdIdx2, Chem.BondType.TRIPLE)
+                else:
+                    rdmol.AddBond(rdIdx1, rdIdx2, Chem.BondType.SINGLE)
+
+        rdmol = rdmol.GetMol()
+        # sanitization perceives aromaticity, so that different
+        # Kekule structures of the same ring give the same key
+        try:
+            Chem.SanitizeMol(rdmol)
+        except ValueError:
+            rdmol.UpdatePropertyCache(strict=False)
+
+        return rdmol
+
+    def getMolecularWeight(self):
+        """
+        Return the fragmental weight of the fragment in kg/mol.
+        """
+        if self.property_table is not None:
+            return self.property_table.molecular_weights[self.library_id]
+
+        if self._molecular_weight is None:
+            mass = getElement(1).mass * int(self.hydrogen_counts.sum())
+            for idx in np.flatnonzero(self.codes > 0):
+                mass += getElement(int(self.codes[idx]), int(self.isotopes[idx])).mass
+            self._molecular_weight = mass
+        return self._molecular_weight
+
+    def getRadicalCount(self):
+        """
+        Return the total number of radical electrons on all atoms.
+        """
+        return int(self.radicals.sum())
+
+    def isRadical(self):
+        """
+        Return ``True`` if the fragment contains at least one radical electron,
+        or ``False`` otherwise.
+        """
+        return bool(self.radicals.any())
+
+    def get_element_count(self):
+        """
+        Returns the element count for the fragment as a dictionary,
+        in the same form as :meth:`Fragment.get_element_count`.
+        """
+        if self.property_table is not None:
+            return self.property_table.get_element_count(self.library_id)
+
+        element_count = {}
+        num_hydrogens = int(self.hydrogen_counts.sum())
+        if num_hydrogens:
+            element_count['H'] = num_hydrogens
+        for idx in np.flatnonzero(self.codes > 0):
+            symbol = getElement(int(self.codes[idx])).symbol
+            isotope = int(self.isotopes[idx])
+            key = symbol if isotope == -1 else (symbol, isotope)
+            element_count[key] = element_count.get(key, 0) + 1
+
+        return element_count
+
+    def get_cutting_label_count(self):
+        """
+        Returns the cutting label count for the fragment as a dictionary
+        with label names, e.g., 'R' and 'L', as keys.
+        """
+        cutting_label_count = {}
+        for code in self.codes[self.codes < 0]:
+            name = self.label_names[-code - 1]
+            cutting_label_count[name] = cutting_label_count.get(name, 0) + 1
+
+        return cutting_label_count
+
+    def getFormula(self):
+        """
+        Return the molecular formula for the fragment.
+        """
+        if self.property_table is not None:
+            return self.property_table.formulas[self.library_id]
+
+        elements = self.get_cutting_label_count()
+        num_hydrogens = int(self.hydrogen_counts.sum())
+        if num_hydrogens:
+            elements['H'] = num_hydrogens
+        for code in self.codes[self.codes > 0]:
+            symbol = getElement(int(code)).symbol
+            elements[symbol] = elements.get(symbol, 0) + 1
+
+        return get_formula_from_counts(elements)
+
+def get_formula_from_counts(elements):
+    """
+    Return the formula in the Hill system for a dictionary of symbol
+    counts, in which cutting labels are counted under their names.
+    """
+    elements = dict(elements)
+    formula = ''
+    
+    # Carbon and hydrogen always come first if carbon is present
+    if 'C' in elements.keys():
+        count = elements['C']
+        formula += 'C{0:d}'.format(count) if count > 1 else 'C'
+        del elements['C']
+        if 'H' in elements.keys():
+            count = elements['H']
+            formula += 'H{0:d}'.format(count) if count > 1 else 'H'
+            del elements['H']
+
+    # Other atoms are in alphabetical order
+    # (This includes hydrogen if carbon is not present)
+    keys = elements.keys()
+    keys.sort()
+    for key in keys:
+        count = elements[key]
+        formula += '{0}{1:d}'.format(key, count) if count > 1 else key
+    
+    return formula
+
+def fragment_from_compact_state(state):
+    """
+    Rebuild a :class:`Fragment` from the compact state returned by
+    :meth:`Fragment.get_compact_state`.
+    """
+    label_names = state['label_names']
+    vertices = []
+    for idx, code in enumerate(state['codes']):
+        if code < 0:
+            vertex = CuttingLabel(name=label_names[-code - 1], 
+                                  label=state['atom_labels'][idx], 
+                                  id=state['ids'][idx])
+        else:
+            vertex = Atom(element=getElement(code, state['isotopes'][idx]),
+                          radicalElectrons=state['radicals'][idx],
+                          charge=state['charges'][idx],
+                          label=state['atom_labels'][idx],
+                          lonePairs=state['lone_pairs'][idx])
+            vertex.id = state['ids'][idx]
+            atom_type = state['atom_types'][idx]
+            if atom_type is not None:
+                vertex.atomType = atomTypes[atom_type]
+        vertices.append(vertex)
+
+    fragment = Fragment(label=state['label'],
+                        species_repr=state['species_repr'],
+                        vertices=vertices,
+                        symmetry=state['symmetryNumber'],
+                        multiplicity=state['multiplicity'],
+                        reactive=state['reactive'],
+                        props=state['props'])
+
+    bond_pairs = state['bond_pairs']
+    for bond_idx, order in enumerate(state['bond_orders']):
+        vertex1 = vertices[bond_pairs[2*bond_idx]]
+        vertex2 = vertices[bond_pairs[2*bond_idx + 1]]
+        fragment.addEdge(Bond(vertex1, vertex2, order))
+
+    fragment._canonical_key = state['canonical_key']
+
+    return fragment
+
+def get_cutting_label_isotope(name):
+    """
+    Encode a cutting label name, e.g., 'R' or 'L1', into a positive
+    integer which is injective over ASCII names. It is used as the
+    isotope of the RDKit dummy atom standing for the cutting label.
+    """
+    isotope = 0
+    for char in name:
+        isotope = isotope * 128 + ord(char)
+    return isotope
+
+def get_cutting_label_name(isotope):
+    """
+    Decode the cutting label name encoded by
+    :func:`get_cutting_label_isotope`.
+    """
+    chars = []
+    while isotope > 0:
+        isotope, code = divmod(isotope, 128)
+        chars.append(chr(code))
+    return ''.join(reversed(chars))
+
+def to_labeled_SMILES(SMILES_like_string, token_map=None):
+    """
+    Tokenize a SMILES-like string in a single pass, writing every
+    cutting label outside of brackets as a dummy atom, e.g., 'RCCL'
+    becomes '[82*]CC[76*]'. `token_map` is an optional dictionary
+    of the replacements, shared between calls.
+    """
+    if token_map is None:
+        token_map = {}
+
+    def replace(match):
+        token = match.group(0)
+        if token[0] == '[':
+            return token
+        replacement = token_map.get(token)
+        if replacement is None:
+            replacement = '[{0}*]'.format(get_cutting_label_isotope(token))
+            token_map[token] = replacement
+        return replacement
+
+    return SMILES_LIKE_TOKEN_PATTERN.sub(replace, SMILES_like_string)
+
+def from_labeled_SMILES(labeled_SMILES):
+    """
+    Write every dummy atom of a labeled SMILES string, as returned by
+    :func:`to_labeled_SMILES`, as the cutting label name it encodes.
+    """
+    def replace(match):
+        return get_cutting_label_name(int(match.group(1)))
+
+    return LABELED_DUMMY_ATOM_PATTERN.sub(replace, labeled_SMILES)
+
+def fragments_from_SMILES_like_strings(SMILES_like_strings, labels=None):
+    """
+    Return a list of fragments for a list of SMILES-like strings, with
+    one RDKit parse per string and the label tokenization shared across
+    the batch. If `labels` is given, it sets the fragment labels.
+    """
+    from rdkit import Chem
+
+    token_map = {}
+    fragments = []
+    for idx, SMILES_like_string in enumerate(SMILES_like_strings):
+        rdkitmol = Chem.MolFromSmiles(to_labeled_SMILES(SMILES_like_string, token_map))
+        label = labels[idx] if labels is not None else ''
+        fragments.append(Fragment(label=label).fromRDKitMol(rdkitmol))
+
+    return fragments
+
+def is_foldable_hydrogen(vertex):
+    """
+    Return ``True`` if `vertex` is a plain hydrogen atom singly bonded
+    to a non-hydrogen atom, i.e., one that SMILES writes implicitly.
+    """
+    if not isinstance(vertex, Atom) or not vertex.isHydrogen():
+        return False
+    if vertex.radicalElectrons or vertex.charge or vertex.element.isotope != -1:
+        return False
+    if len(vertex.edges) != 1:
+        return False
+    neighbor = vertex.edges.keys()[0]
+    return isinstance(neighbor, Atom) and not neighbor.isHydrogen()
+
+# bracket atoms are single tokens, so cutting labels are only
+# matched outside of them
+SMILES_LIKE_TOKEN_PATTERN = re.compile(r'\[[^\]]*\]|[LR]\d?')
+LABELED_DUMMY_ATOM_PATTERN = re.compile(r'\[(\d+)\*\]')
+
+# the GroupPrefilterIndex consulted by Fragment.isSubgraphIsomorphic,
+# set by afm.react.react_fragments while reacting fragments
+group_prefilter_index = None
+
+# hit and miss counts of the memoized representative molecules
+# of all fragments, see Fragment.assign_representative_molecule()
+representative_cache_info = {'hits': 0, 'misses': 0}
+
 # this variable is used to name atom IDs so that there are as few conflicts by 
 # using the entire space of integer objects
 atom_id_counter = -2**15
@@ -0,0 +1,233 @@
+import multiprocessing
+
+from rmgpy.chemkin import loadSpeciesDictionary
+from rmgpy.molecule.molecule import Bond, Molecule
+
+from afm.fragment import CuttingLabel, Fragment
+
+# cut single bonds between two sp3 carbons by default
+DEFAULT_CUT_BOND_TYPES = (('Cs', 'Cs'),)
+
+class Fragmenter(object):
+    """
+    A fragmenter which cuts molecules into fragments and collects the
+    unique fragments in a library:
+
+    =================== ========================================================
+    Attribute           Description
+    =================== ========================================================
+    `cut_bond_types`    A list of atom type label pairs, e.g., ('Cs', 'Cs');
+                        a single bond between atoms of a listed pair of atom
+                        types, which is not in a ring, can be cut
+    `min_heavy_atoms`   The minimal number of heavy atoms on each side of a cut
+    `label_names`       The names of the cutting labels put on the first and
+                        the second atom of a cut bond, ('R', 'L') by default,
+                        or ('R', 'R') for fragments with R labels only
+    `fragments_by_key`  A dictionary of the unique fragments by canonical key
+    `labels`            The set of the labels of the unique fragments
+    `label_count`       The index of the last label generated for a new fragment
+    =================== ========================================================
+
+    Fragments isomorphic to one already in the library are deduplicated
+    through their canonical keys. Unlabeled new fragments are given short,
+    Chemkin-safe labels by :func:`get_fragment_label`; their SMILES-like
+    strings are only written by :meth:`save_fragment_smiles`.
+    """
+
+    def __init__(self, cut_bond_types=DEFAULT_CUT_BOND_TYPES, min_heavy_atoms=1,
+                 label_names=('R', 'L'), fragments=None):
+        self.cut_bond_types = [tuple(bond_type) for bond_type in cut_bond_types]
+        self.min_heavy_atoms = min_heavy_atoms
+        self.label_names = tuple(label_names)
+        self.fragments_by_key = {}
+        self.labels = set()
+        self.label_count = 0
+        for frag in fragments or []:
+            if frag.canonical_key not in self.fragments_by_key:
+                self.fragments_by_key[frag.canonical_key] = frag
+                self.labels.add(frag.label)
+
+    def __len__(self):
+        return len(self.fragments_by_key)
+
+    def get_fragments(self):
+        """
+        Return the list of the unique fragments, sorted by label.
+        """
+        return sorted(self.fragments_by_key.values(), key=lambda frag: frag.label)
+
+    def get_fragments_dict(self):
+        """
+        Return the label-key dictionary of the unique fragments, as
+        returned by :func:`afm.loader.load_fragments`.
+        """
+        return dict([(frag.label, frag) for frag in self.fragments_by_key.values()])
+
+    def add_fragments(self, fragments):
+        """
+        Add `fragments` to the library and return the labels of the
+        library fragments they are isomorphic to, in order.
+        """
+        labels = []
+        for frag in fragments:
+            key = frag.canonical_key
+            if key not in self.fragments_by_key:
+                if not frag.label:
+                    self.label_count += 1
+                    frag.label = get_fragment_label(frag, self.label_count)
+                    # skip the labels of fragments given to the library
+                    while frag.label in self.labels:
+                        self.label_count += 1
+                        frag.label = get_fragment_label(frag, self.label_count)
+                self.fragments_by_key[key] = frag
+                self.labels.add(frag.label)
+            labels.append(self.fragments_by_key[key].label)
+
+        return labels
+
+    def fragment_molecule(self, molecule):
+        """
+        Cut `molecule`, a :class:`Molecule` or an adjacency list, into
+        fragments, add them to the library and return their labels.
+        """
+        return self.add_fragments(cut_molecule(molecule,
+                                               self.cut_bond_types,
+                                               self.min_heavy_atoms,
+                                               self.label_names))
+
+    def fragment_molecules(self, molecules, processes=1):
+        """
+        Cut a list of molecules or adjacency lists into fragments and
+        return the list of the fragment labels of every molecule. If
+        `processes` is larger than 1, the molecules are cut in a process
+        pool of that size and deduplicated afterwards in order, so the
+        result does not depend on `processes`.
+        """
+        args = [(molecule, self.cut_bond_types, self.min_heavy_atoms, self.label_names)
+                for molecule in molecules]
+
+        if processes > 1 and len(args) > 1:
+            chunksize = len(args) // (4*processes) + 1
+            pool = multiprocessing.Pool(processes)
+            try:
+                fragments_list = pool.map(cut_molecule_star, args, chunksize)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            fragments_list = [cut_molecule_star(arg) for arg in args]
+
+        return [self.add_fragments(fragments) for fragments in fragments_list]
+
+    def fragment_species_dictionary(self, dictionary_path, processes=1):
+        """
+        Cut the species of an RMG species dictionary file, e.g.,
+        `species_dictionary.txt`, into fragments and return a dictionary
+        mapping the species labels to their fragment labels.
+        """
+        species_dict = loadSpeciesDictionary(dictionary_path)
+        labels = sorted(species_dict.keys())
+        molecules = [species_dict[label].molecule[0] for label in labels]
+        fragment_labels = self.fragment_molecules(molecules, processes=processes)
+
+        return dict(zip(labels, fragment_labels))
+
+    def save_fragment_smiles(self, fragment_smiles_path):
+        """
+        Write the library in the `label: smiles-like string` format
+        read by :func:`afm.loader.load_fragments`.
+        """
+        with open(fragment_smiles_path, 'w') as f_out:
+            for frag in self.get_fragments():
+                f_out.write('{0}: {1}\n'.format(frag.label, frag.to_SMILES_like_string()))
+
+def cut_molecule(molecule, cut_bond_types=DEFAULT_CUT_BOND_TYPES, min_heavy_atoms=1,
+                 label_names=('R', 'L')):
+    """
+    Return the list of fragments of `molecule`, a :class:`Molecule` or an
+    adjacency list, cut at the bonds allowed by `cut_bond_types` (see
+    :class:`Fragmenter`). Bonds are considered in the order of the atoms,
+    and a bond is only cut if both sides keep at least `min_heavy_atoms`
+    heavy atoms. The canonical keys of the fragments are generated, so
+    they are carried along when the fragments are sent between processes.
+    """
+    if isinstance(molecule, Molecule):
+        molecule = molecule.copy(deep=True)
+    else:
+        molecule = Molecule().fromAdjacencyList(molecule)
+
+    cut_bond_types = set([tuple(bond_type) for bond_type in cut_bond_types] +
+                         [tuple(reversed(bond_type)) for bond_type in cut_bond_types])
+
+    atom_index = dict([(atom, idx) for idx, atom in enumerate(molecule.atoms)])
+    cut_pairs = []
+    for idx1, atom1 in enumerate(molecule.atoms):
+        for atom2, bond in atom1.edges.items():
+            if atom_index[atom2] < idx1:
+                continue
+            if not bond.isSingle() or molecule.isEdgeInCycle(bond):
+                continue
+            if (atom1.atomType.label, atom2.atomType.label) not in cut_bond_types:
+                continue
+
+            # cut tentatively and keep the cut if both sides are large enough
+            molecule.removeBond(bond)
+            if (count_heavy_atoms(atom1) < min_heavy_atoms or
+                    count_heavy_atoms(atom2) < min_heavy_atoms):
+                molecule.addBond(bond)
+            else:
+                cut_pairs.append((atom1, atom2))
+
+    vertices = list(molecule.atoms)
+    for atom1, atom2 in cut_pairs:
+        for atom, label_name in zip((atom1, atom2), label_names):
+            cutting_label = CuttingLabel(name=label_name)
+            bond = Bond(atom, cutting_label, 1)
+            atom.edges[cutting_label] = bond
+            cutting_label.edges[atom] = bond
+            vertices.append(cutting_label)
+
+    fragments = []
+    for frag in Fragment(vertices=vertices).split():
+        frag.update()
+        frag.canonical_key
+        fragments.append(frag)
+
+    return fragments
+
+def get_fragment_label(frag, index):
+    """
+    Return the label of the `index`-th new fragment of a library, e.g.,
+    'F12', 'ArF12' or 'F12*', following the label convention of the
+    fragment libraries: aromatic fragments start with 'Ar' and radical
+    fragments end with '*'. The labels are valid Chemkin species names
+    of at most 16 characters for up to 10^11 fragments.
+    """
+    label = 'F{0:d}'.format(index)
+    if frag.getAromaticRings()[0]:
+        label = 'Ar' + label
+    if frag.isRadical():
+        label += '*'
+    return label
+
+def cut_molecule_star(args):
+    """
+    Call :func:`cut_molecule` with a tuple of arguments, so that
+    it can be mapped by a process pool.
+    """
+    return cut_molecule(*args)
+
+def count_heavy_atoms(atom):
+    """
+    Return the number of heavy atoms in the connected component of `atom`.
+    """
+    visited = set([atom])
+    stack = [atom]
+    while stack:
+        vertex = stack.pop()
+        for neighbor in vertex.edges:
+            if neighbor not in visited:
+                visited.add(neighbor)
+                stack.append(neighbor)
+
+    return len([vertex for vertex in visited if not vertex.isHydrogen()])
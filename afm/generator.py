@@ -0,0 +1,367 @@
+import os
+import hashlib
+import argparse
+import multiprocessing
+
+import rmgpy
+from rmgpy import settings
+from rmgpy.data.rmg import RMGDatabase
+from rmgpy.kinetics import KineticsData
+from rmgpy.rmg.model import getFamilyLibraryObject
+from rmgpy.data.kinetics.family import TemplateReaction
+from rmgpy.data.kinetics.depository import DepositoryReaction
+
+import afm.cache
+import afm.loader
+import afm.thermo
+from afm.utils import parse_reaction_string, read_frag_mech_by_family
+from afm.mechanism import FragmentMechanism
+
+# the rates of reactions of these fragments in these families are
+# multiplied by 4, following the corrections of the original notebook
+RATE_CORRECTED_LABELS = ('RCC*CCR', 'LCC*CCR', 'LCC*CCL')
+RATE_CORRECTED_FAMILIES = ('R_Recombination', 'H_Abstraction', 'R_Addition_MultipleBond')
+
+def load_database(families='all', thermo_libraries=('primaryThermoLibrary',)):
+    """
+    Load the RMG database with the kinetics `families` and the
+    `thermo_libraries`, and fill the kinetics rules of the families
+    from their training sets and by averaging up.
+    """
+    database = RMGDatabase()
+    database.load(path=settings['database.directory'],
+                  thermoLibraries=list(thermo_libraries),
+                  kineticsFamilies=families,
+                  reactionLibraries=[],
+                  kineticsDepositories='')
+
+    for family in database.kinetics.families.values():
+        family.addKineticsRulesFromTrainingSet(thermoDatabase=database.thermo)
+    for family in database.kinetics.families.values():
+        family.fillKineticsRulesByAveragingUp()
+
+    return database
+
+def get_thermo_database_version(thermo_libraries):
+    """
+    Return a hex digest identifying the thermo database that the fragment
+    thermo is estimated with: the RMG version, the database directory and
+    the names and files of the `thermo_libraries`, in their order. Changes
+    to the thermo groups are only covered through the RMG version.
+    """
+    database_directory = settings['database.directory']
+    sha1 = hashlib.sha1()
+    sha1.update('{0}:{1}'.format(rmgpy.__version__, os.path.abspath(database_directory)))
+    for library in thermo_libraries:
+        sha1.update(':' + library)
+        path = os.path.join(database_directory, 'thermo', 'libraries', library + '.py')
+        if os.path.exists(path):
+            sha1.update(':' + afm.cache.get_file_hash(path))
+    return sha1.hexdigest()
+
+def get_database_version(family, thermo_version):
+    """
+    Return a hex digest identifying the database that the reactions of
+    `family` are generated with: the family files and the thermo database
+    identified by `thermo_version`, see :func:`get_thermo_database_version`.
+    """
+    database_directory = settings['database.directory']
+    family_directory = os.path.join(database_directory, 'kinetics', 'families', family)
+    paths = [os.path.join(family_directory, 'groups.py'),
+             os.path.join(family_directory, 'rules.py'),
+             os.path.join(family_directory, 'training', 'reactions.py'),
+             os.path.join(family_directory, 'training', 'dictionary.txt')]
+
+    sha1 = hashlib.sha1()
+    sha1.update('{0}:{1}'.format(thermo_version, family))
+    for path in paths:
+        if os.path.exists(path):
+            sha1.update(':' + afm.cache.get_file_hash(path))
+    return sha1.hexdigest()
+
+class ReactionBuildCache(object):
+    """
+    A cache of generated reactions, with thermo and corrected kinetics,
+    keyed by (family label, reaction string, database version), so that
+    a rebuild after editing a fragment mechanism only generates the
+    added or changed reaction lines.
+    """
+
+    def __init__(self, reactions=None):
+        self.reactions = reactions or {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.reactions)
+
+    def __reduce__(self):
+        """
+        A helper function used when pickling the object.
+        """
+        return (ReactionBuildCache, (self.reactions,))
+
+    def get_reaction(self, family, reaction_string, database_version):
+        """
+        Return the cached reaction of `reaction_string` in `family`,
+        or ``None`` on a cache miss.
+        """
+        rxn0 = self.reactions.get((family, reaction_string, database_version))
+        if rxn0 is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rxn0
+
+    def add_reaction(self, family, reaction_string, database_version, rxn0):
+        """
+        Cache the reaction `rxn0` generated for `reaction_string` in `family`.
+        """
+        self.reactions[(family, reaction_string, database_version)] = rxn0
+
+def load_reaction_cache(fragment_smiles_path, cache_dir):
+    """
+    Return the reaction build cache stored next to the fragment library
+    cache of `fragment_smiles_path`, or an empty one on a cache miss.
+    """
+    cache_path = afm.cache.get_cache_path(cache_dir, 'reactions', fragment_smiles_path)
+    reaction_cache = afm.cache.load_cache(cache_path)
+    if reaction_cache is None:
+        return ReactionBuildCache()
+
+    return reaction_cache
+
+def save_reaction_cache(fragment_smiles_path, cache_dir, reaction_cache):
+    """
+    Store `reaction_cache` next to the fragment library cache
+    of `fragment_smiles_path`.
+    """
+    cache_path = afm.cache.get_cache_path(cache_dir, 'reactions', fragment_smiles_path)
+    afm.cache.save_cache(cache_path, reaction_cache)
+
+def generate_fragment_mechanism(fragment_smiles_path,
+                                frag_mech_path,
+                                output_directory=None,
+                                database=None,
+                                processes=1,
+                                chunksize=50,
+                                cache_dir=None,
+                                thermo_libraries=('primaryThermoLibrary',)):
+    """
+    Generate the fragment reactions listed in the text fragment mechanism
+    at `frag_mech_path` for the fragments of `fragment_smiles_path`, with
+    thermo and kinetics, and return them as a :class:`FragmentMechanism`,
+    which the simulators accept directly. If `output_directory` is given,
+    the mechanism is also saved as `chem_annotated.inp` and
+    `species_dictionary.txt` there.
+
+    The reaction strings of every family are split into chunks of at most
+    `chunksize` reactions. If `processes` is larger than 1, the chunks are
+    generated in a process pool of that size, forked after the database
+    is loaded, and the results are merged in the order of the file.
+
+    If `database` is not given, it is loaded with the families of the
+    mechanism and the `thermo_libraries`. If `cache_dir` is given, the
+    fragment library, resonance structures, thermo and generated reactions
+    are cached there. A rebuild then only generates the reaction lines
+    that are not cached yet, and only loads the database if there are any.
+    """
+    fragments_dict = afm.loader.load_fragments(fragment_smiles_path, cache_dir=cache_dir)
+    fragments = sorted(fragments_dict.values(), key=lambda frag: frag.library_id)
+
+    if database is not None:
+        thermo_libraries = database.thermo.libraryOrder
+    thermo_version = get_thermo_database_version(thermo_libraries)
+
+    # react the aromatic resonance structure of every fragment
+    if cache_dir is not None:
+        resonance_cache = afm.cache.load_resonance_cache(fragment_smiles_path, cache_dir)
+        thermo_cache = afm.thermo.load_thermo_cache(fragment_smiles_path, cache_dir, None,
+                                                    database_version=thermo_version)
+        reaction_cache = load_reaction_cache(fragment_smiles_path, cache_dir)
+    else:
+        resonance_cache = afm.cache.ResonanceCache()
+        thermo_cache = afm.thermo.FragmentThermoCache(database_version=thermo_version)
+        reaction_cache = ReactionBuildCache()
+    resonance_cache.assign_resonance_structures(fragments)
+
+    family_reaction_strings = read_frag_mech_by_family(frag_mech_path)
+    database_versions = dict([(family, get_database_version(family, thermo_version))
+                              for family, _ in family_reaction_strings])
+
+    tasks = []
+    for family, reaction_strings in family_reaction_strings:
+        missing = [reaction_string for reaction_string in reaction_strings
+                   if reaction_cache.get_reaction(family, reaction_string,
+                                                  database_versions[family]) is None]
+        for idx in xrange(0, len(missing), chunksize):
+            tasks.append((family, missing[idx:idx + chunksize]))
+
+    if database is None and (tasks or not all([frag in thermo_cache for frag in fragments])):
+        database = load_database(families=[family for family, _ in family_reaction_strings],
+                                 thermo_libraries=thermo_libraries)
+    if database is not None:
+        thermo_cache.thermo_database = database.thermo
+
+    # estimate the thermo of all fragments once, before the workers fork
+    thermo_cache.assign_thermo(fragments)
+
+    if processes > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(processes,
+                                    initialize_generation,
+                                    (database, fragments_dict, thermo_cache))
+        try:
+            reactions_list = pool.map(generate_reactions, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        initialize_generation(database, fragments_dict, thermo_cache)
+        try:
+            reactions_list = [generate_reactions(task) for task in tasks]
+        finally:
+            initialize_generation(None, None, None)
+
+    for (family, reaction_strings), reactions in zip(tasks, reactions_list):
+        for reaction_string, rxn0 in zip(reaction_strings, reactions):
+            reaction_cache.add_reaction(family, reaction_string, database_versions[family], rxn0)
+
+    # merge the cached and the new reactions in the order of the file
+    reaction_list = []
+    for family, reaction_strings in family_reaction_strings:
+        for reaction_string in reaction_strings:
+            reaction_list.append(reaction_cache.reactions[(family, reaction_string,
+                                                           database_versions[family])])
+
+    mechanism = FragmentMechanism(fragments_dict,
+                                  [frag.species_repr for frag in fragments],
+                                  reaction_list)
+    if output_directory is not None:
+        mechanism.save_chemkin(output_directory)
+
+    if cache_dir is not None:
+        afm.cache.save_resonance_cache(fragment_smiles_path, cache_dir, resonance_cache)
+        afm.thermo.save_thermo_cache(fragment_smiles_path, cache_dir, thermo_cache)
+        save_reaction_cache(fragment_smiles_path, cache_dir, reaction_cache)
+
+    return mechanism
+
+def initialize_generation(database, fragments_dict, thermo_cache):
+    """
+    Set the database, fragments and thermo cache used by
+    :func:`generate_reactions`, e.g., as the initializer
+    of the worker processes.
+    """
+    global _database, _fragments_dict, _thermo_cache
+    _database = database
+    _fragments_dict = fragments_dict
+    _thermo_cache = thermo_cache
+
+def generate_reactions(task):
+    """
+    Generate the reactions of a (family label, reaction strings) task,
+    with thermo for their species and estimated and corrected kinetics,
+    and return them in the order of the reaction strings.
+    """
+    family_label, reaction_strings = task
+    reactions = []
+    for reaction_string in reaction_strings:
+        reactant_strings, product_strings = parse_reaction_string(reaction_string)
+
+        reactants = [_fragments_dict[reactant_string].species_repr for reactant_string in reactant_strings]
+        products = [_fragments_dict[product_string].species_repr.molecule[0] for product_string in product_strings]
+
+        for idx, reactant in enumerate(reactants):
+            for mol in reactant.molecule:
+                mol.props['label'] = reactant_strings[idx]
+
+        for idx, product in enumerate(products):
+            product.props['label'] = product_strings[idx]
+
+        # reactants are Species objects and products are Molecule
+        # objects; returned reactions have Species on both sides
+        new_rxns = _database.kinetics.generate_reactions_from_families(reactants=reactants,
+                                                                       products=products,
+                                                                       only_families=[family_label],
+                                                                       resonance=True)
+        if len(new_rxns) != 1:
+            raise Exception('Non-unique reaction is generated with {0} in {1}'.format(reaction_string, family_label))
+
+        rxn0 = new_rxns[0]
+        _thermo_cache.assign_species_thermo(rxn0.reactants + rxn0.products, _fragments_dict)
+        estimate_kinetics(rxn0)
+        correct_kinetics(rxn0)
+        reactions.append(rxn0)
+
+    return reactions
+
+def estimate_kinetics(rxn0):
+    """
+    Estimate the Arrhenius kinetics of the template reaction `rxn0` from
+    the rate rules of its family, in its forward direction.
+    """
+    family = getFamilyLibraryObject(rxn0.family)
+    kinetics, source, entry, isForward = family.getKinetics(rxn0,
+                                                            templateLabels=rxn0.template,
+                                                            degeneracy=rxn0.degeneracy,
+                                                            estimator='rate rules',
+                                                            returnAllKinetics=False)
+    rxn0.kinetics = kinetics
+
+    if not isForward:
+        rxn0.reactants, rxn0.products = rxn0.products, rxn0.reactants
+        rxn0.pairs = [(p, r) for r, p in rxn0.pairs]
+
+    # convert KineticsData to Arrhenius forms
+    if isinstance(rxn0.kinetics, KineticsData):
+        rxn0.kinetics = rxn0.kinetics.toArrhenius()
+    # correct barrier heights of estimated kinetics
+    if isinstance(rxn0, TemplateReaction) or isinstance(rxn0, DepositoryReaction):
+        rxn0.fixBarrierHeight() # also converts ArrheniusEP to Arrhenius.
+
+def correct_kinetics(rxn0):
+    """
+    Multiply the rate of `rxn0` by 4 for each of its species in
+    `RATE_CORRECTED_LABELS`, if it is in `RATE_CORRECTED_FAMILIES`.
+    """
+    if rxn0.family in RATE_CORRECTED_FAMILIES:
+        for spe in rxn0.reactants + rxn0.products:
+            if spe.label in RATE_CORRECTED_LABELS:
+                rxn0.kinetics.changeRate(4)
+
+def main():
+    """
+    Command-line entry point, e.g.,
+
+        python -m afm.generator fragment_smiles.txt frag_mech.txt -o output -p 8
+    """
+    parser = argparse.ArgumentParser(description='Generate a fragment mechanism in Chemkin format.')
+    parser.add_argument('fragment_smiles', help='the fragment library file of smiles-like strings')
+    parser.add_argument('frag_mech', help='the text fragment mechanism file')
+    parser.add_argument('-o', '--output-directory', default='.',
+                        help='the directory of the Chemkin and species dictionary files')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help='the number of worker processes')
+    parser.add_argument('-c', '--chunksize', type=int, default=50,
+                        help='the maximal number of reactions per task')
+    parser.add_argument('--cache-dir', default=None,
+                        help='the directory of the fragment library, resonance, thermo and reaction caches')
+    parser.add_argument('--thermo-libraries', nargs='*', default=['primaryThermoLibrary'],
+                        help='the RMG thermo libraries to use')
+    args = parser.parse_args()
+
+    generate_fragment_mechanism(args.fragment_smiles,
+                                args.frag_mech,
+                                args.output_directory,
+                                processes=args.processes,
+                                chunksize=args.chunksize,
+                                cache_dir=args.cache_dir,
+                                thermo_libraries=args.thermo_libraries)
+
+# the database, fragments and thermo cache of the running generation
+_database = None
+_fragments_dict = None
+_thermo_cache = None
+
+if __name__ == '__main__':
+    main()
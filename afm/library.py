@@ -0,0 +1,341 @@
+import multiprocessing
+
+import numpy as np
+
+from afm.fragment import CompactFragment
+
+class FragmentPropertyTable(object):
+    """
+    A library-level table of fragment properties, i.e., molecular
+    weights, element counts, cutting label counts and radical flags,
+    stored in NumPy arrays and indexed by an integer fragment id.
+
+    If `attach` is ``True``, building the table attaches it to every
+    fragment (`property_table` and `library_id` attributes), so that
+    property getters of the fragments read from the table instead of
+    walking their vertices. Only the owner of the fragments, e.g., the
+    loader of a fragment library, should attach them, since a fragment
+    is attached to one table at a time.
+    """
+
+    def __init__(self, fragments, attach=True):
+
+        fragments = list(fragments)
+
+        self.labels = [frag.label for frag in fragments]
+        self.label_to_id = {}
+        for frag_id, label in enumerate(self.labels):
+            if label in self.label_to_id:
+                raise Exception('Fragment with duplicated labels found: {0}'.format(label))
+            self.label_to_id[label] = frag_id
+
+        element_count_list = [frag.get_element_count() for frag in fragments]
+        elements = set()
+        for element_count in element_count_list:
+            elements.update(element_count.keys())
+        self.elements = sorted(elements, key=str)
+        element_index = dict([(element, idx) for idx, element in enumerate(self.elements)])
+
+        self.element_counts = np.zeros((len(fragments), len(self.elements)), dtype=np.int32)
+        for frag_id, element_count in enumerate(element_count_list):
+            for element, count in element_count.iteritems():
+                self.element_counts[frag_id, element_index[element]] = count
+
+        self.molecular_weights = np.array([frag.getMolecularWeight() for frag in fragments], dtype=np.float64)
+        self.formulas = [frag.getFormula() for frag in fragments]
+
+        self.r_counts = np.zeros(len(fragments), dtype=np.int32)
+        self.l_counts = np.zeros(len(fragments), dtype=np.int32)
+        for frag_id, frag in enumerate(fragments):
+            for name, count in frag.get_cutting_label_count().iteritems():
+                if name.startswith('R'):
+                    self.r_counts[frag_id] += count
+                elif name.startswith('L'):
+                    self.l_counts[frag_id] += count
+
+        self.radical_counts = np.array([frag.getRadicalCount() for frag in fragments], dtype=np.int32)
+        self.radical_flags = self.radical_counts > 0
+
+        if attach:
+            self.attach(fragments)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def attach(self, fragments):
+        """
+        Link `fragments` to this table so that their property getters
+        read from it, e.g., after the table is loaded from a cache.
+        """
+        for frag in fragments:
+            frag.property_table = self
+            frag.library_id = self.label_to_id[frag.label]
+
+    def get_id(self, label):
+        """
+        Return the integer fragment id of the fragment labeled `label`.
+        """
+        return self.label_to_id[label]
+
+    def get_element_count(self, frag_id):
+        """
+        Return the element count of fragment `frag_id` as a dictionary.
+        """
+        element_count = {}
+        for idx in np.flatnonzero(self.element_counts[frag_id]):
+            element_count[self.elements[idx]] = int(self.element_counts[frag_id, idx])
+        return element_count
+
+    def get_total_weights(self, label_groups):
+        """
+        Given a list of label tuples, e.g., the flattened matches
+        from re-attachment, return a NumPy array of the summed
+        molecular weight of each tuple in kg/mol.
+        """
+        frag_ids = []
+        offsets = []
+        for labels in label_groups:
+            offsets.append(len(frag_ids))
+            frag_ids.extend([self.label_to_id[label] for label in labels])
+
+        if not offsets:
+            return np.zeros(0)
+
+        return np.add.reduceat(self.molecular_weights[frag_ids], offsets)
+
+def get_property_table(fragments_dict):
+    """
+    Return the property table shared by all the fragments in
+    `fragments_dict`, building a new one if they are not
+    attached to a common table. A new table is not attached
+    to the fragments, which keep their own table and ids.
+    """
+    tables = set([frag.property_table for frag in fragments_dict.values()])
+    if len(tables) == 1:
+        table = tables.pop()
+        if table is not None and len(table) == len(fragments_dict):
+            return table
+
+    labels = sorted(fragments_dict.keys())
+    return FragmentPropertyTable([fragments_dict[label] for label in labels], attach=False)
+
+class FragmentLibrary(object):
+    """
+    A collection of fragments with the integer ids of their property
+    table and secondary indexes for structure lookups:
+
+    =================== ========================================================
+    Index               Lookup
+    =================== ========================================================
+    label               :meth:`get_id`, ``library[label]``, O(1)
+    formula             :meth:`get_ids_by_formula`, O(1)
+    label signature     :meth:`get_ids_by_label_signature`, O(1), by the
+                        numbers of R and L cutting labels
+    molecular weight    :meth:`get_ids_in_weight_range`, O(log n), on the
+                        weights sorted once
+    canonical key       :meth:`find`, O(1) after the keys are generated
+                        on the first call
+    =================== ========================================================
+    """
+
+    def __init__(self, fragments):
+
+        fragments = list(fragments)
+        tables = set([frag.property_table for frag in fragments])
+        table = tables.pop() if len(tables) == 1 else None
+        if table is not None and len(table) == len(fragments):
+            # keep the ids of the shared table
+            fragments.sort(key=lambda frag: frag.library_id)
+        else:
+            # the fragments may be attached to the tables of their owners
+            table = FragmentPropertyTable(fragments, attach=False)
+
+        self.fragments = fragments
+        self.property_table = table
+
+        self.formula_index = {}
+        for frag_id, formula in enumerate(table.formulas):
+            self.formula_index.setdefault(formula, []).append(frag_id)
+
+        self.label_signature_index = {}
+        for frag_id, signature in enumerate(zip(table.r_counts, table.l_counts)):
+            signature = (int(signature[0]), int(signature[1]))
+            self.label_signature_index.setdefault(signature, []).append(frag_id)
+
+        self.weight_order = np.argsort(table.molecular_weights, kind='mergesort')
+        self.sorted_weights = table.molecular_weights[self.weight_order]
+
+        self.key_index = None
+
+    @classmethod
+    def from_fragments_dict(cls, fragments_dict):
+        """
+        Build the library of the fragments in a label-key dictionary,
+        e.g., the one returned by :func:`afm.loader.load_fragments`.
+        """
+        return cls(fragments_dict.values())
+
+    def __len__(self):
+        return len(self.fragments)
+
+    def __iter__(self):
+        return iter(self.fragments)
+
+    def __contains__(self, label):
+        return label in self.property_table.label_to_id
+
+    def __getitem__(self, label):
+        return self.fragments[self.property_table.get_id(label)]
+
+    def get_id(self, label):
+        """
+        Return the integer fragment id of the fragment labeled `label`.
+        """
+        return self.property_table.get_id(label)
+
+    def get_fragments(self, frag_ids):
+        """
+        Return the list of fragments with ids `frag_ids`.
+        """
+        return [self.fragments[frag_id] for frag_id in frag_ids]
+
+    def get_ids_by_formula(self, formula):
+        """
+        Return the list of ids of the fragments with `formula`,
+        written as by :meth:`Fragment.getFormula`, e.g., 'C4H8R2'.
+        """
+        return list(self.formula_index.get(formula, []))
+
+    def get_ids_by_label_signature(self, r_count, l_count):
+        """
+        Return the list of ids of the fragments with `r_count`
+        R cutting labels and `l_count` L cutting labels.
+        """
+        return list(self.label_signature_index.get((r_count, l_count), []))
+
+    def get_ids_in_weight_range(self, min_weight, max_weight):
+        """
+        Return a NumPy array of the ids of the fragments whose molecular
+        weight in kg/mol is in the closed range [`min_weight`, `max_weight`],
+        sorted by weight.
+        """
+        start = np.searchsorted(self.sorted_weights, min_weight, side='left')
+        end = np.searchsorted(self.sorted_weights, max_weight, side='right')
+        return self.weight_order[start:end]
+
+    def get_weight_bins(self, bin_edges):
+        """
+        Return a NumPy array of the bin index of every fragment for the
+        molecular weight bins with increasing `bin_edges` in kg/mol, as
+        :func:`numpy.digitize` does, i.e., 0 below the first edge and
+        ``len(bin_edges)`` above the last edge.
+        """
+        return np.searchsorted(bin_edges, self.property_table.molecular_weights, side='right')
+
+    def get_substructure_mask(self, group):
+        """
+        Return a boolean array which is ``False`` for every fragment that
+        can not contain `group`, by comparing the element counts, radical
+        count and multiplicity of the representative molecules, i.e., the
+        fragments with every cutting label capped by an ethyl group.
+        """
+        table = self.property_table
+        num_labels = table.r_counts + table.l_counts
+        element_index = dict([(element, idx) for idx, element in enumerate(table.elements)])
+
+        mask = np.ones(len(self), dtype=bool)
+        for element, count in group.elementCount.iteritems():
+            if element in element_index:
+                counts = table.element_counts[:, element_index[element]]
+            else:
+                counts = np.zeros(len(self), dtype=np.int32)
+            if element == 'C':
+                counts = counts + 2*num_labels
+            elif element == 'H':
+                counts = counts + 5*num_labels
+            mask &= counts >= count
+
+        mask &= table.radical_counts >= group.radicalCount
+        if group.multiplicity:
+            mask &= np.in1d(table.radical_counts + 1, group.multiplicity)
+
+        return mask
+
+    def find_substructure_matches(self, group, processes=1):
+        """
+        Return the sorted list of ids of the fragments whose representative
+        molecules contain `group`, e.g., the reactive site of a family.
+        Fragments are first prefiltered with :meth:`get_substructure_mask`,
+        and if `processes` is larger than 1, the remaining subgraph matches
+        run in a process pool of that size.
+        """
+        candidate_ids = [int(frag_id) for frag_id in np.flatnonzero(self.get_substructure_mask(group))]
+
+        if processes > 1 and len(candidate_ids) > 1:
+            chunksize = len(candidate_ids) // (4*processes) + 1
+            chunks = [candidate_ids[idx:idx + chunksize]
+                      for idx in xrange(0, len(candidate_ids), chunksize)]
+            # workers are forked with the fragments and the group,
+            # so only the fragment ids are sent to them
+            pool = multiprocessing.Pool(processes,
+                                        initialize_substructure_search,
+                                        (self.fragments, group))
+            try:
+                matches = sum(pool.map(match_substructure, chunks), [])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            initialize_substructure_search(self.fragments, group)
+            try:
+                matches = match_substructure(candidate_ids)
+            finally:
+                initialize_substructure_search(None, None)
+
+        return sorted(matches)
+
+    def find(self, fragment):
+        """
+        Return the id of the library fragment with the canonical key of
+        `fragment`, e.g., a newly generated product, or ``None`` if there
+        is none. Fragments of other formulas are rejected without keys.
+        """
+        candidate_ids = self.formula_index.get(fragment.getFormula(), [])
+        if not candidate_ids:
+            return None
+
+        if self.key_index is None:
+            self.key_index = {}
+            for frag_id, frag in enumerate(self.fragments):
+                self.key_index.setdefault(frag.canonical_key, []).append(frag_id)
+
+        frag_ids = self.key_index.get(fragment.canonical_key)
+        return frag_ids[0] if frag_ids else None
+
+def initialize_substructure_search(fragments, group):
+    """
+    Set the fragments and the group used by :func:`match_substructure`,
+    e.g., as the initializer of the worker processes.
+    """
+    global _search_fragments, _search_group
+    _search_fragments = fragments
+    _search_group = group
+
+def match_substructure(frag_ids):
+    """
+    Return the list of ids in `frag_ids` of the fragments whose
+    representative molecules contain the group of the search.
+    """
+    matches = []
+    for frag_id in frag_ids:
+        frag = _search_fragments[frag_id]
+        if isinstance(frag, CompactFragment):
+            frag = frag.to_fragment()
+        if frag.isSubgraphIsomorphic(_search_group):
+            matches.append(frag_id)
+
+    return matches
+
+# the fragments and the group of the running substructure search
+_search_fragments = None
+_search_group = None
@@ -1,45 +1,64 @@
 import os
+import multiprocessing
 
 from rmgpy.kinetics import Arrhenius
 from rmgpy.chemkin import loadChemkinFile
 
-from afm.fragment import Fragment
+import afm.cache
+from afm.fragment import CompactFragment, fragments_from_SMILES_like_strings
 from afm.reaction import FragmentReaction
+from afm.library import FragmentPropertyTable
 
 def load_fragment_reactions_from_chemkin(chemkin_path,
                                         dictionary_path, 
-                                        fragment_smiles_path):
+                                        fragment_smiles_path,
+                                        cache_dir=None,
+                                        compact=False):
     """
     This method loads chemkin mechanism and 
     generate fragment reactions in irreversible
-    format.
+    format. If `cache_dir` is given, the fragment
+    library and the parsed Chemkin files are cached
+    on disk there. If `compact` is ``True``, the
+    reactions are built on :class:`CompactFragment`
+    objects.
     """
-    speciesList, reactionList = loadChemkinFile(chemkin_path, dictionary_path)
+    speciesList, reactionList = load_chemkin_file(chemkin_path, dictionary_path, cache_dir=cache_dir)
     
-    # load fragment from smiles-like string
-    fragments = []
-    with open(fragment_smiles_path) as f_in:
-        for line in f_in:
-            if line.strip() and not line.startswith('#') and ':' in line:
-                label, smiles = [token.strip() for token in line.split(":")]
-                frag = Fragment(label=label).from_SMILES_like_string(smiles)
-                frag.assign_representative_species()
-                frag.species_repr.label = label
-                for prev_frag in fragments:
-                    if frag.isIsomorphic(prev_frag):
-                        raise Exception('Isomorphic duplicate found: {0} and {1}'.format(label, prev_frag.label))
-                fragments.append(frag)
+    fragments_dict = load_fragments(fragment_smiles_path, cache_dir=cache_dir, compact=compact)
 
-    # construct label-key fragment dictionary
-    fragments_dict = {}
-    for frag0 in fragments:
-        if frag0.label not in fragments_dict:
-            fragments_dict[frag0.label] = frag0
-        else:
-            raise Exception('Fragment with duplicated labels found: {0}'.format(frag0.label))
+    return fragments_dict, get_fragment_reactions(reactionList, fragments_dict)
+
+def load_chemkin_file(chemkin_path, dictionary_path, cache_dir=None):
+    """
+    Return the species list and reaction list of a Chemkin file and
+    its species dictionary. If `cache_dir` is given, the parsed species
+    and reactions are cached there, keyed by the content hashes of both
+    files, and reused by later calls, e.g., in other processes.
+    """
+    if cache_dir is not None:
+        cached = afm.cache.load_chemkin_cache(chemkin_path, dictionary_path, cache_dir)
+        if cached is not None:
+            return cached
 
+    speciesList, reactionList = loadChemkinFile(chemkin_path, dictionary_path)
+
+    if cache_dir is not None:
+        afm.cache.save_chemkin_cache(chemkin_path, dictionary_path, cache_dir,
+                                     speciesList, reactionList)
+
+    return speciesList, reactionList
+
+def get_fragment_reactions(reaction_list, fragments_dict):
+    """
+    Return the irreversible fragment reactions of a list of
+    RMG reactions whose species are labeled by fragment labels,
+    the forward reactions first and then the reverse ones. The
+    kinetics of the reverse reactions are only computed when
+    needed (see :class:`FragmentReaction`).
+    """
     orig_fragrxns = []
-    for rxn0 in reactionList:
+    for rxn0 in reaction_list:
         fragrxts = [fragments_dict[spec.label] for spec in rxn0.reactants]
         
         fragprds = [fragments_dict[spec.label] for spec in rxn0.products]
@@ -56,49 +75,182 @@ def load_fragment_reactions_from_chemkin(chemkin_path,
 
 
     revs_fragrxns = []
-    for rxn0 in reactionList:
+    for rxn0 in reaction_list:
         fragrxts = [fragments_dict[spec.label] for spec in rxn0.products]
         
         fragprds = [fragments_dict[spec.label] for spec in rxn0.reactants]
         
         fragpairs = [(fragments_dict[prod.label], fragments_dict[rxt.label]) for rxt, prod in rxn0.pairs]
         
-        revs_kinetics = rxn0.generateReverseRateCoefficient()
+        # the reverse kinetics are fitted lazily on first access
         fragrxn = FragmentReaction(index=-1,
                                     reactants=fragrxts,
                                     products=fragprds,
-                                    kinetics=revs_kinetics,
+                                    kinetics=None,
                                    reversible=False,
                                     pairs=fragpairs,
-                                    family=rxn0.family)
+                                    family=rxn0.family,
+                                    reverse_of=rxn0)
         revs_fragrxns.append(fragrxn)
 
-    return fragments_dict, orig_fragrxns + revs_fragrxns
+    return orig_fragrxns + revs_fragrxns
 
-def load_pseudo_fragment_reactions(fragments_dict):
+def load_fragments(fragment_smiles_path, cache_dir=None, processes=1, compact=False):
     """
-    Currently only returns a pseudo reaction. It can be
-    extended to generate multiple ractions in the future.
+    This method loads fragments from smiles-like strings
+    and returns a label-key fragment dictionary. Isomorphic
+    duplicates are detected by bucketing fragments with their
+    canonical keys, so full isomorphism checks only run on
+    key collisions. The fragments are attached to a library
+    property table with ids in the order of the file.
+
+    If `cache_dir` is given, the parsed library is cached there,
+    keyed by the content hash of `fragment_smiles_path` and the
+    afm version, and reused by later calls.
+
+    If `processes` is larger than 1, the smiles-like strings are
+    parsed in a process pool of that size and the duplicate check
+    is done afterwards in the parent process.
+
+    If `compact` is ``True``, the fragments are returned as
+    :class:`CompactFragment` objects attached to the same
+    property table, which keeps large libraries in memory.
     """
+    if cache_dir is not None:
+        fragments = afm.cache.load_fragment_library_cache(fragment_smiles_path, cache_dir)
+        if fragments is not None:
+            if compact:
+                fragments = compact_fragments(fragments)
+            return dict([(frag.label, frag) for frag in fragments])
 
-    pseudo_fragrxts = ['RC*C__C', 'RCCCCR']
-    pseudo_fragprds = ['RCCCCC__CC*']
-    pseudo_frag_pairs = [('RC*C__C', 'RCCCCC__CC*'), ('RCCCCR', 'RCCCCC__CC*')]
+    label_smiles_pairs = []
+    with open(fragment_smiles_path) as f_in:
+        for line in f_in:
+            if line.strip() and not line.startswith('#') and ':' in line:
+                label, smiles = [token.strip() for token in line.split(":")]
+                label_smiles_pairs.append((label, smiles))
 
-    fragrxts = [fragments_dict[label] for label in pseudo_fragrxts]
-        
-    fragprds = [fragments_dict[label] for label in pseudo_fragprds]
+    if processes > 1 and len(label_smiles_pairs) > 1:
+        chunksize = len(label_smiles_pairs) // (4*processes) + 1
+        chunks = [label_smiles_pairs[idx:idx + chunksize]
+                  for idx in xrange(0, len(label_smiles_pairs), chunksize)]
+        pool = multiprocessing.Pool(processes)
+        try:
+            fragments = sum(pool.map(parse_fragments, chunks), [])
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        fragments = parse_fragments(label_smiles_pairs)
 
-    fragpairs = [(fragments_dict[rxt_label], fragments_dict[prod_label]) for rxt_label, prod_label in pseudo_frag_pairs]
+    fragments_by_key = {}
+    for frag in fragments:
+        register_fragment(frag, fragments_by_key)
 
-    pseudo_kinetics = Arrhenius(A=(2.000e+05, 'cm^3/(mol*s)'), n=0.0, Ea=(0.0, 'kcal/mol'), T0=(1, 'K'))
+    # construct label-key fragment dictionary
+    fragments_dict = {}
+    for frag0 in fragments:
+        if frag0.label not in fragments_dict:
+            fragments_dict[frag0.label] = frag0
+        else:
+            raise Exception('Fragment with duplicated labels found: {0}'.format(frag0.label))
+
+    FragmentPropertyTable(fragments)
+
+    if cache_dir is not None:
+        afm.cache.save_fragment_library_cache(fragment_smiles_path, cache_dir, fragments)
+
+    if compact:
+        fragments_dict = dict([(frag.label, frag) for frag in compact_fragments(fragments)])
+
+    return fragments_dict
+
+def compact_fragments(fragments):
+    """
+    Return the :class:`CompactFragment` forms of `fragments`,
+    attached to the property table of the fragments if any.
+    """
+    property_table = fragments[0].property_table if fragments else None
+    compacts = [CompactFragment.from_fragment(frag) for frag in fragments]
+    if property_table is not None:
+        property_table.attach(compacts)
+
+    return compacts
 
-    pseudo_fragrxn = FragmentReaction(index=-1,
-                                reactants=fragrxts,
-                                products=fragprds,
-                                kinetics=pseudo_kinetics,
-                                reversible=False,
-                                pairs=fragpairs,
-                                family='pseudo_rxn')
+def parse_fragments(label_smiles_pairs):
+    """
+    Create fragments with their representative species from
+    a list of (label, smiles-like string) pairs, parsed in one
+    batch. It is a module-level function so that it can be sent
+    to worker processes.
+    """
+    labels = [label for label, _ in label_smiles_pairs]
+    smiles_list = [smiles for _, smiles in label_smiles_pairs]
+    fragments = fragments_from_SMILES_like_strings(smiles_list, labels)
+    for frag in fragments:
+        frag.assign_representative_species()
+        frag.species_repr.label = frag.label
+        # generate the key here so that it is carried by the
+        # compact state when sent back from a worker process
+        frag.canonical_key
+
+    return fragments
+
+def register_fragment(frag, fragments_by_key):
+    """
+    Add `frag` to `fragments_by_key`, a dictionary of canonical
+    key to fragments, and raise an exception if an isomorphic
+    fragment has been registered before.
+    """
+    bucket = fragments_by_key.setdefault(frag.canonical_key, [])
+    for prev_frag in bucket:
+        if frag.isIsomorphic(prev_frag):
+            raise Exception('Isomorphic duplicate found: {0} and {1}'.format(frag.label, prev_frag.label))
+    bucket.append(frag)
+
+# the rate of the former built-in pseudo reaction RC*C__C + RCCCCR == RCCCCC__CC*,
+# used for bimolecular pseudo reactions given without Arrhenius parameters
+DEFAULT_PSEUDO_KINETICS = {2: (2.000e+05, 0.0, 0.0)}
+
+def get_pseudo_fragment_reactions(pseudo_reactions, fragments_dict,
+                                  default_kinetics=DEFAULT_PSEUDO_KINETICS):
+    """
+    Return the fragment reactions of parsed pseudo reactions, as returned
+    by :func:`afm.utils.read_pseudo_rxn`. Reactant coefficients must be
+    integers, while product coefficients can be fractional, e.g., in
+    `RCC == RC + 0.25 RCCCCR`. Reactions without Arrhenius parameters
+    use the `default_kinetics` (A, n, Ea) of their molecularity.
+    """
+    pseudo_fragrxns = []
+    for reactant_terms, product_terms, arrhenius in pseudo_reactions:
+        fragrxts = []
+        for coefficient, label in reactant_terms:
+            if coefficient != int(coefficient):
+                raise Exception('Fractional reactant coefficient in pseudo reaction: {0} {1}'.format(coefficient, label))
+            fragrxts.extend([fragments_dict[label]]*int(coefficient))
+        if len(fragrxts) not in (1, 2):
+            raise Exception('Pseudo reactions need one or two reactants, got {0}'.format(len(fragrxts)))
+
+        fragprds = [fragments_dict[label] for _, label in product_terms]
+        product_coefficients = [coefficient for coefficient, _ in product_terms]
+
+        if arrhenius is None:
+            if len(fragrxts) not in default_kinetics:
+                raise Exception('No kinetics given for pseudo reaction of {0}'.format(
+                                ' + '.join([frag.label for frag in fragrxts])))
+            arrhenius = default_kinetics[len(fragrxts)]
+        A, n, Ea = arrhenius
+        A_units = 'cm^3/(mol*s)' if len(fragrxts) == 2 else 's^-1'
+        pseudo_kinetics = Arrhenius(A=(A, A_units), n=n, Ea=(Ea, 'kcal/mol'), T0=(1, 'K'))
+
+        pseudo_fragrxn = FragmentReaction(index=-1,
+                                    reactants=fragrxts,
+                                    products=fragprds,
+                                    kinetics=pseudo_kinetics,
+                                    reversible=False,
+                                    pairs=None,
+                                    family='pseudo_rxn',
+                                    product_coefficients=product_coefficients)
+        pseudo_fragrxns.append(pseudo_fragrxn)
 
-    return [pseudo_fragrxn]
\ No newline at end of file
+    return pseudo_fragrxns
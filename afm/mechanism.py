@@ -0,0 +1,163 @@
+import os
+
+import afm.cache
+import afm.utils
+import afm.loader
+import afm.chemkin
+import afm.library
+import afm.network
+
+class FragmentMechanism(object):
+    """
+    A fragment mechanism held in memory, as generated by
+    :func:`afm.generator.generate_fragment_mechanism` or loaded
+    from Chemkin files, which the simulators accept directly:
+
+    =================== ========================================================
+    Attribute           Description
+    =================== ========================================================
+    `fragments_dict`    A dictionary of the fragments by label
+    `species_list`      The RMG species of the fragments, with thermo, labeled
+                        by the fragment labels
+    `reaction_list`     The reversible RMG reactions of the species in
+                        `species_list`, with kinetics
+    `pseudo_reactions`  Parsed pseudo reactions (see
+                        :func:`afm.utils.read_pseudo_rxn`), appended to the
+                        irreversible fragment reactions
+    =================== ========================================================
+
+    The irreversible fragment reactions and their compiled network are
+    built once per form and shared by all the simulators of the mechanism,
+    which only read them.
+    """
+
+    def __init__(self, fragments_dict, species_list, reaction_list, pseudo_reactions=None):
+        self.fragments_dict = fragments_dict
+        self.species_list = species_list
+        self.reaction_list = reaction_list
+        self.pseudo_reactions = pseudo_reactions or []
+        self._fragment_reactions = {}
+        self._reaction_networks = {}
+
+    def __len__(self):
+        return len(self.reaction_list)
+
+    def get_fragment_reactions(self, compact=False):
+        """
+        Return the label-key fragment dictionary and the irreversible
+        fragment reactions of the mechanism, the forward reactions first,
+        then the reverse ones and then the pseudo reactions. If `compact`
+        is ``True``, the reactions are built on :class:`CompactFragment`
+        objects.
+        """
+        if compact not in self._fragment_reactions:
+            fragments_dict = self.fragments_dict
+            if compact:
+                fragments = sorted(fragments_dict.values(), key=lambda frag: frag.library_id)
+                fragments_dict = dict([(frag.label, frag)
+                                       for frag in afm.loader.compact_fragments(fragments)])
+
+            fragment_rxns = afm.loader.get_fragment_reactions(self.reaction_list, fragments_dict)
+            fragment_rxns.extend(afm.loader.get_pseudo_fragment_reactions(self.pseudo_reactions,
+                                                                          fragments_dict))
+            self._fragment_reactions[compact] = (fragments_dict, fragment_rxns)
+
+        return self._fragment_reactions[compact]
+
+    def get_reaction_network(self, compact=False):
+        """
+        Return the :class:`FragmentReactionNetwork` of the irreversible
+        fragment reactions returned by :meth:`get_fragment_reactions`.
+        """
+        if compact not in self._reaction_networks:
+            fragments_dict, fragment_rxns = self.get_fragment_reactions(compact=compact)
+            property_table = afm.library.get_property_table(fragments_dict)
+            self._reaction_networks[compact] = afm.network.FragmentReactionNetwork(fragment_rxns,
+                                                                                   property_table)
+
+        return self._reaction_networks[compact]
+
+    def with_pseudo_reactions(self, pseudo_rxn_path):
+        """
+        Return a new mechanism with the same fragments, species and
+        reactions, and the pseudo reactions of the file at
+        `pseudo_rxn_path` added, e.g., `common_rules/pseudo_rxn.txt`.
+        """
+        pseudo_reactions = self.pseudo_reactions + afm.utils.read_pseudo_rxn(pseudo_rxn_path)
+        return FragmentMechanism(self.fragments_dict,
+                                 self.species_list,
+                                 self.reaction_list,
+                                 pseudo_reactions)
+
+    def save_chemkin(self, output_directory, verbose=True):
+        """
+        Save the mechanism as `chem_annotated.inp` and
+        `species_dictionary.txt` in `output_directory`. The element
+        counts of the species are those of the fragments, i.e., the
+        ethyl caps of the cutting labels are not counted.
+        """
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+        afm.chemkin.save_chemkin_file(os.path.join(output_directory, 'chem_annotated.inp'),
+                                      self.species_list,
+                                      self.reaction_list,
+                                      self.fragments_dict,
+                                      verbose=verbose)
+        afm.chemkin.save_species_dictionary(os.path.join(output_directory, 'species_dictionary.txt'),
+                                            self.species_list)
+
+def load_fragment_mechanism(chemkin_path, dictionary_path, fragment_smiles_path, cache_dir=None,
+                            pseudo_rxn_path=None):
+    """
+    Load a fragment mechanism from Chemkin and species dictionary files
+    whose species are labeled by the fragment labels of the library at
+    `fragment_smiles_path`, with the pseudo reactions of the file at
+    `pseudo_rxn_path` if given. If `cache_dir` is given, the fragment
+    library and the parsed Chemkin files are cached on disk there.
+    """
+    species_list, reaction_list = afm.loader.load_chemkin_file(chemkin_path,
+                                                               dictionary_path,
+                                                               cache_dir=cache_dir)
+    fragments_dict = afm.loader.load_fragments(fragment_smiles_path, cache_dir=cache_dir)
+
+    pseudo_reactions = None
+    if pseudo_rxn_path is not None:
+        pseudo_reactions = afm.utils.read_pseudo_rxn(pseudo_rxn_path)
+
+    return FragmentMechanism(fragments_dict, species_list, reaction_list, pseudo_reactions)
+
+def get_fragment_mechanism(chemkin_path, dictionary_path, fragment_smiles_path, cache_dir=None,
+                           pseudo_rxn_path=None):
+    """
+    Return the fragment mechanism of the Chemkin, species dictionary,
+    fragment library and optional pseudo reaction files, loading it on
+    the first call only. Later calls in the same process with files of
+    the same content and the same `cache_dir` return the same
+    :class:`FragmentMechanism`, so simulators built on it share one parse.
+    The shared mechanism, its fragments and its reactions must therefore
+    not be changed in place.
+    """
+    key = tuple([afm.cache.get_file_hash(path)
+                 for path in (chemkin_path, dictionary_path, fragment_smiles_path)] +
+                [pseudo_rxn_path and afm.cache.get_file_hash(pseudo_rxn_path), cache_dir])
+    mechanism = mechanism_cache.get(key)
+    if mechanism is None:
+        mechanism = load_fragment_mechanism(chemkin_path,
+                                            dictionary_path,
+                                            fragment_smiles_path,
+                                            cache_dir=cache_dir,
+                                            pseudo_rxn_path=pseudo_rxn_path)
+        mechanism_cache[key] = mechanism
+
+    return mechanism
+
+def clear_mechanism_cache():
+    """
+    Drop the mechanisms loaded by :func:`get_fragment_mechanism`.
+    """
+    mechanism_cache.clear()
+
+# the mechanisms loaded in this process by the content hashes
+# of their files, including the pseudo reaction file, and the
+# cache directory
+mechanism_cache = {}
@@ -0,0 +1,180 @@
+import collections
+
+import numpy as np
+import scipy.sparse
+
+import rmgpy.constants
+
+import afm.reaction
+
+class FragmentReactionNetwork(object):
+    """
+    A compiled form of a list of irreversible fragment reactions for
+    vectorized rate evaluations, stored as arrays indexed by the integer
+    fragment ids of a library property table and by reaction index:
+
+    ======================== ===================================================
+    Attribute                Description
+    ======================== ===================================================
+    `fragment_reactions`     A tuple of the :class:`FragmentReaction` objects,
+                             read-only as the arrays are indexed by it
+    `labels`                 The fragment labels in the order of their ids
+    `label_to_id`            A dictionary of fragment ids by label
+    `reactant_ids`           A (reactions, 2) array of the reactant ids of every
+                             reaction, padded with -1 for unimolecular ones
+    `product_ids`            A (reactions, products) array of the product ids,
+                             padded with -1
+    `product_coefficients`   The coefficients of `product_ids`, fractional for
+                             some pseudo reactions
+    `molecularity`           The number of reactants of every reaction
+    `reactant_stoichiometry` A sparse (fragments, reactions) matrix of the
+                             reactant coefficients
+    `product_stoichiometry`  A sparse (fragments, reactions) matrix of the
+                             product coefficients
+    `stoichiometry`          The net sparse stoichiometry matrix, products
+                             minus reactants, stored by column (reaction)
+    ======================== ===================================================
+
+    Rate coefficients are evaluated once per temperature and memoized.
+    Reactions have one or two reactants, counted once each, and any number
+    of products.
+    """
+
+    def __init__(self, fragment_reactions, property_table):
+        self.fragment_reactions = tuple(fragment_reactions)
+        self.labels = property_table.labels
+        self.label_to_id = property_table.label_to_id
+
+        num_rxns = len(fragment_reactions)
+        for frag_rxn in fragment_reactions:
+            if len(frag_rxn.reactants) > 2:
+                raise Exception('Reactions with more than two reactants are not supported: {0}'.format(frag_rxn))
+        max_products = max([len(frag_rxn.products) for frag_rxn in fragment_reactions] + [1])
+
+        self.reactant_ids = np.full((num_rxns, 2), -1, dtype=np.int32)
+        self.product_ids = np.full((num_rxns, max_products), -1, dtype=np.int32)
+        self.product_coefficients = np.zeros((num_rxns, max_products))
+        for rxn_idx, frag_rxn in enumerate(fragment_reactions):
+            for idx, reactant in enumerate(frag_rxn.reactants):
+                self.reactant_ids[rxn_idx, idx] = self.label_to_id[reactant.label]
+            for idx, product in enumerate(frag_rxn.products):
+                self.product_ids[rxn_idx, idx] = self.label_to_id[product.label]
+            if frag_rxn.product_coefficients is None:
+                self.product_coefficients[rxn_idx, :len(frag_rxn.products)] = 1.0
+            else:
+                self.product_coefficients[rxn_idx, :len(frag_rxn.products)] = frag_rxn.product_coefficients
+        self.molecularity = (self.reactant_ids >= 0).sum(axis=1).astype(np.int32)
+
+        self.reactant_stoichiometry = get_stoichiometry_matrix(self.reactant_ids, len(self.labels))
+        self.product_stoichiometry = get_stoichiometry_matrix(self.product_ids, len(self.labels),
+                                                              self.product_coefficients)
+        self.stoichiometry = (self.product_stoichiometry - self.reactant_stoichiometry).tocsc()
+
+        self._rate_coefficients = {}
+
+    def __len__(self):
+        return len(self.fragment_reactions)
+
+    def get_rate_coefficients(self, T):
+        """
+        Return the array of the rate coefficients of the reactions at
+        temperature `T` in SI units, memoized by temperature.
+        """
+        if T not in self._rate_coefficients:
+            self._rate_coefficients[T] = afm.reaction.get_rate_coefficients(self.fragment_reactions, T)
+        return self._rate_coefficients[T]
+
+    def get_count_array(self, count_dict, dtype=np.float64):
+        """
+        Return the array of the fragment counts, or amounts, in
+        `count_dict`, a dictionary by fragment label, of type `dtype`.
+        """
+        counts = np.zeros(len(self.labels), dtype=dtype)
+        for label, count in count_dict.iteritems():
+            counts[self.label_to_id[label]] = count
+        return counts
+
+    def get_count_dict(self, counts):
+        """
+        Return a dictionary by fragment label of the `counts` array.
+        """
+        return dict(zip(self.labels, counts.tolist()))
+
+    def get_reactant_products(self, amounts):
+        """
+        Return the product of the reactant `amounts` of every reaction.
+        """
+        padded = np.append(amounts, 1.0)
+        # index -1 picks the padding 1.0 for unimolecular reactions
+        return padded[self.reactant_ids[:, 0]] * padded[self.reactant_ids[:, 1]]
+
+    def get_propensities(self, counts, T, volume):
+        """
+        Return the propensities (unit: 1/s) of the reactions for the
+        fragment `counts` in `volume` (unit: m^3) at temperature `T`.
+        The bimolecular rate coefficients are converted from m^3/(mol*s)
+        to m^3/s per molecule pair.
+        """
+        scales = np.where(self.molecularity == 2, 1.0/(rmgpy.constants.Na*volume), 1.0)
+        return self.get_rate_coefficients(T) * scales * self.get_reactant_products(counts)
+
+    def get_rates(self, concentrations, T):
+        """
+        Return the rates (unit: mol/(m^3*s)) of the reactions for the
+        fragment `concentrations` (unit: mol/m^3) at temperature `T`.
+        """
+        return self.get_rate_coefficients(T) * self.get_reactant_products(concentrations)
+
+    def get_rhs(self, concentrations, T):
+        """
+        Return the net production rates (unit: mol/(m^3*s)) of the
+        fragments for their `concentrations` at temperature `T`.
+        """
+        return self.stoichiometry.dot(self.get_rates(concentrations, T))
+
+class FragmentCountView(collections.MutableMapping):
+    """
+    A live dictionary view by fragment label of an array of fragment
+    counts indexed by the fragment ids of a :class:`FragmentReactionNetwork`.
+    Reading and writing the view reads and writes the array; fragments
+    cannot be added or removed.
+    """
+
+    def __init__(self, counts, network):
+        self.counts = counts
+        self.network = network
+
+    def __getitem__(self, label):
+        return self.counts[self.network.label_to_id[label]].item()
+
+    def __setitem__(self, label, count):
+        self.counts[self.network.label_to_id[label]] = count
+
+    def __delitem__(self, label):
+        raise Exception('Cannot remove fragment {0} from the fragment counts'.format(label))
+
+    def __iter__(self):
+        return iter(self.network.labels)
+
+    def __len__(self):
+        return len(self.network.labels)
+
+    def __contains__(self, label):
+        return label in self.network.label_to_id
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+def get_stoichiometry_matrix(ids, num_fragments, coefficients=None):
+    """
+    Return the sparse (fragments, reactions) matrix of the `coefficients`,
+    1 by default, of the fragment `ids`, a (reactions, terms) array padded
+    with -1; duplicated ids in a reaction sum up.
+    """
+    rxn_indices, columns = np.nonzero(ids >= 0)
+    if coefficients is None:
+        data = np.ones(len(rxn_indices))
+    else:
+        data = coefficients[rxn_indices, columns]
+    return scipy.sparse.csc_matrix((data, (ids[rxn_indices, columns], rxn_indices)),
+                                   shape=(num_fragments, ids.shape[0]))
@@ -1,21 +1,163 @@
+import numpy as np
+import rmgpy.molecule.group as gr
 
+import afm.fragment
 
-def react_fragments(kinetics_db, 
+class GroupPrefilterIndex(object):
+    """
+    A precomputed index of the necessary conditions for a fragment to
+    match the groups of reaction families, i.e., the minimal element
+    counts, the minimal radical count and the allowed multiplicities,
+    stored as NumPy arrays with one row per group.
+
+    :meth:`get_mask` compares a fragment against all the groups in one
+    vectorized step, so impossible groups are eliminated before any
+    graph matching. Groups which are not indexed, e.g., logic nodes,
+    always pass the prefilter.
+    """
+
+    def __init__(self, groups):
+
+        self.groups = list(groups)
+        self.group_index = dict([(id(group), idx) for idx, group in enumerate(self.groups)])
+
+        elements = set()
+        for group in self.groups:
+            elements.update(group.elementCount.keys())
+        self.elements = sorted(elements, key=str)
+        element_index = dict([(element, idx) for idx, element in enumerate(self.elements)])
+
+        self.element_counts = np.zeros((len(self.groups), len(self.elements)), dtype=np.int32)
+        for group_idx, group in enumerate(self.groups):
+            for element, count in group.elementCount.iteritems():
+                self.element_counts[group_idx, element_index[element]] = count
+
+        self.radical_counts = np.array([group.radicalCount for group in self.groups], dtype=np.int32)
+
+        # multiplicity_mask[i, m] is True if group i allows multiplicity m;
+        # groups without multiplicity requirement allow any multiplicity
+        max_multiplicity = max([max(group.multiplicity) for group in self.groups
+                                if group.multiplicity] or [1])
+        self.any_multiplicity = np.array([not group.multiplicity for group in self.groups], dtype=bool)
+        self.multiplicity_mask = np.zeros((len(self.groups), max_multiplicity + 1), dtype=bool)
+        self.multiplicity_mask[self.any_multiplicity, :] = True
+        for group_idx, group in enumerate(self.groups):
+            for multiplicity in group.multiplicity:
+                self.multiplicity_mask[group_idx, multiplicity] = True
+
+        self.mask_cache = {}
+
+    def __len__(self):
+        return len(self.groups)
+
+    @classmethod
+    def from_kinetics_database(cls, kinetics_db, only_families=None):
+        """
+        Build the index over the groups of all the families of
+        `kinetics_db`, or only of those in `only_families`.
+        """
+        groups = []
+        for label, family in kinetics_db.families.iteritems():
+            if only_families is not None and label not in only_families:
+                continue
+            for entry in family.groups.entries.values():
+                if isinstance(entry.item, gr.Group):
+                    groups.append(entry.item)
+
+        return cls(groups)
+
+    def get_mask(self, fragment):
+        """
+        Return a boolean array which is ``False`` for every group that
+        `fragment` can not match. Masks are cached by the element counts,
+        radical count and multiplicity of the representative molecule,
+        which are all that the comparison depends on, and memoized on the
+        fragment until its graph is changed.
+        """
+        memo = fragment._prefilter_mask
+        if memo is not None and memo[0] is self:
+            return memo[1]
+
+        element_count = fragment.get_representative_element_count()
+        radical_count = fragment.getRadicalCount()
+        # the representative molecule has the radicals of the fragment
+        multiplicity = radical_count + 1
+
+        counts = np.array([element_count.get(element, 0) for element in self.elements], dtype=np.int32)
+        key = (counts.tostring(), radical_count)
+        mask = self.mask_cache.get(key)
+        if mask is None:
+            mask = (self.element_counts <= counts).all(axis=1)
+            mask &= self.radical_counts <= radical_count
+            if multiplicity < self.multiplicity_mask.shape[1]:
+                mask &= self.multiplicity_mask[:, multiplicity]
+            else:
+                mask &= self.any_multiplicity
+            self.mask_cache[key] = mask
+
+        fragment._prefilter_mask = (self, mask)
+        return mask
+
+    def may_match(self, fragment, group):
+        """
+        Return ``False`` if `fragment` can not match `group`, or ``True``
+        if it may, including when `group` is not in the index.
+        """
+        group_idx = self.group_index.get(id(group))
+        if group_idx is None:
+            return True
+
+        return bool(self.get_mask(fragment)[group_idx])
+
+    def get_candidate_groups(self, fragment):
+        """
+        Return the list of groups that pass the prefilter for `fragment`.
+        """
+        return [self.groups[idx] for idx in np.flatnonzero(self.get_mask(fragment))]
+
+def get_group_prefilter_index(kinetics_db):
+    """
+    Return the group prefilter index of `kinetics_db`, building it
+    on first use. The index of the last database is kept, since the
+    groups are not changed after the families are loaded.
+    """
+    global _prefilter_database, _prefilter_index
+    if _prefilter_database is not kinetics_db:
+        _prefilter_index = GroupPrefilterIndex.from_kinetics_database(kinetics_db)
+        _prefilter_database = kinetics_db
+
+    return _prefilter_index
+
+def react_fragments(kinetics_db,
                     fragment_tuple,
-                    products=None, 
+                    products=None,
                     only_families=None,
-                    prod_resonance=True):
+                    prod_resonance=True,
+                    prefilter=True):
 
     """
     Given a tuple of fragment objects, generates all possible reactions
     from the loaded reaction families and combines degenerate reactions.
 
+    If `prefilter` is ``True``, the subgraph isomorphism checks of the
+    fragments are screened by the group prefilter index of `kinetics_db`.
+
     The generated reactions are deflated.
     """
-
-    reactions = kinetics_db.react_molecules(fragment_tuple, 
-                                            products=products, 
-                                            only_families=only_families, 
-                                            prod_resonance=prod_resonance)
+    previous_index = afm.fragment.group_prefilter_index
+    if prefilter:
+        afm.fragment.group_prefilter_index = get_group_prefilter_index(kinetics_db)
+    try:
+        reactions = kinetics_db.react_molecules(fragment_tuple,
+                                                products=products,
+                                                only_families=only_families,
+                                                prod_resonance=prod_resonance)
+    finally:
+        afm.fragment.group_prefilter_index = previous_index
 
     return reactions
+
+# the database and index returned by the last
+# call of get_group_prefilter_index()
+_prefilter_database = None
+_prefilter_index = None
@@ -1,3 +1,4 @@
+import numpy as np
 
 class FragmentReaction(object):
 
@@ -9,7 +10,9 @@ class FragmentReaction(object):
 				reversible=False,
 				pairs=None,
 				family=None,
-				reaction_repr=None
+				reaction_repr=None,
+				reverse_of=None,
+				product_coefficients=None
 				):
 
 		
@@ -21,7 +24,40 @@ class FragmentReaction(object):
 		self.pairs = pairs
 		self.family = family
 		self.reaction_repr = reaction_repr
-	
+		self.reverse_of = reverse_of
+		# fractional product coefficients of pseudo reactions,
+		# or None if every product counts once
+		self.product_coefficients = product_coefficients
+		self.rate_coefficients = {}
+
+	@property
+	def kinetics(self):
+		"""
+		The kinetics of the reaction. For a reaction built as the reverse
+		of the RMG reaction `reverse_of` without kinetics, the reverse
+		kinetics are fitted on first access and memoized.
+		"""
+		if self._kinetics is None and self.reverse_of is not None:
+			self._kinetics = self.reverse_of.generateReverseRateCoefficient()
+		return self._kinetics
+
+	@kinetics.setter
+	def kinetics(self, kinetics):
+		self._kinetics = kinetics
+		self.rate_coefficients = {}
+
+	def get_rate_coefficient(self, T):
+		"""
+		Return the rate coefficient of the reaction at temperature `T`,
+		memoized by temperature.
+		"""
+		k = self.rate_coefficients.get(T)
+		if k is None:
+			k = self.kinetics.getRateCoefficient(T)
+			self.rate_coefficients[T] = k
+
+		return k
+
 	def __str__(self):
 		"""
 		Return a string representation of the reaction, in the form 'A + B <=> C + D'.
@@ -29,3 +65,15 @@ class FragmentReaction(object):
 		arrow = ' <=> '
 		if not self.reversible: arrow = ' => '
 		return arrow.join([' + '.join([str(s) for s in self.reactants]), ' + '.join([str(s) for s in self.products])])
+
+def get_rate_coefficients(fragment_reactions, T):
+	"""
+	Return an array of the rate coefficients of `fragment_reactions` at
+	temperature `T`, memoized in the reactions, fitting the pending
+	reverse kinetics once.
+	"""
+	rate_coefficients = np.zeros(len(fragment_reactions))
+	for idx, frag_rxn in enumerate(fragment_reactions):
+		rate_coefficients[idx] = frag_rxn.get_rate_coefficient(T)
+
+	return rate_coefficients
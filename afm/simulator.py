@@ -7,7 +7,7 @@
 # reaction rule to fire, need to create a
 # dict which has <reaction, rate> pairs
 # s3: realize the reaction rule on fragment level
-# update fragment_count_dict
+# update fragment_count_array
 # s4: realize the reaction rule on molecule level
 # need dict which has <fragment, [mol1, mol2, ...]> pairs
 # update molecule list: some molecules to remove,
@@ -17,29 +17,49 @@ import numpy as np
 import pandas as pd
 
 import rmgpy.constants
-from rmgpy.chemkin import loadChemkinFile
 
 import afm.loader
 import afm.utils
+import afm.library
+import afm.network
+import afm.mechanism
 from afm.canteraModel import Cantera, CanteraCondition
 
 class Simulator(object):
 
-	def __init__(self, chemkin_path, dictionary_path, fragment_smiles_path):
+	def __init__(self, chemkin_path, dictionary_path, fragment_smiles_path, cache_dir=None, compact=False, mechanism=None, pseudo_rxn_path=None):
 
-		self.load_fragment_chemistry(chemkin_path, dictionary_path, fragment_smiles_path)
+		self.load_fragment_chemistry(chemkin_path, dictionary_path, fragment_smiles_path, cache_dir, compact, mechanism, pseudo_rxn_path)
 
-	def load_fragment_chemistry(self, chemkin_path, dictionary_path, fragment_smiles_path):
-
-		fragment_dict, fragment_rxns = afm.loader.load_fragment_reactions_from_chemkin(chemkin_path,
-                                        											   dictionary_path,
-                                        											   fragment_smiles_path)
-
-	#	pseudo_fragrxns = afm.loader.load_pseudo_fragment_reactions(fragment_dict)
-
-	#	self.fragment_reaction_list = fragment_rxns + pseudo_fragrxns
-		self.fragment_reaction_list = fragment_rxns
-		self.fragment_dict = fragment_dict
+	def load_fragment_chemistry(self, chemkin_path, dictionary_path, fragment_smiles_path, cache_dir=None, compact=False, mechanism=None, pseudo_rxn_path=None):
+		"""
+		Load the fragment chemistry from Chemkin files, or take it from
+		`mechanism`, a :class:`FragmentMechanism` returned by the generation,
+		in which case the paths are not used and may be ``None``. The pseudo
+		reactions of the file at `pseudo_rxn_path`, e.g.,
+		`common_rules/pseudo_rxn.txt`, are added if it is given. Simulators
+		built on the same files in one process share a single parse; each
+		simulator gets its own fragment dictionary, while the fragments and
+		the reaction network are shared read-only. `fragment_reaction_list`
+		is the read-only tuple of the reactions of the network, so reaction
+		indices always refer to the reactions the network is built from.
+		"""
+		if mechanism is None:
+			mechanism = afm.mechanism.get_fragment_mechanism(chemkin_path,
+															 dictionary_path,
+															 fragment_smiles_path,
+															 cache_dir=cache_dir,
+															 pseudo_rxn_path=pseudo_rxn_path)
+		elif pseudo_rxn_path is not None:
+			mechanism = mechanism.with_pseudo_reactions(pseudo_rxn_path)
+
+		fragment_dict, _ = mechanism.get_fragment_reactions(compact=compact)
+
+		self.fragment_dict = dict(fragment_dict)
+		self.mechanism = mechanism
+		self.property_table = afm.library.get_property_table(fragment_dict)
+		self.network = mechanism.get_reaction_network(compact=compact)
+		self.fragment_reaction_list = self.network.fragment_reactions
 
 class OdeSimulator(Simulator):
 
@@ -52,14 +72,21 @@ class OdeSimulator(Simulator):
 				fragment_smiles_path,
 				temperature,
 				pressure,
-				outputDirectory='temp'):
+				outputDirectory='temp',
+				cache_dir=None,
+				compact=False,
+				mechanism=None,
+				pseudo_rxn_path=None):
 		super(OdeSimulator, self).__init__(chemkin_path, 
 										   dictionary_path,
-										   fragment_smiles_path)
-
-		speciesList, reactionList = loadChemkinFile(chemkin_path, dictionary_path)
-		self.speciesList = speciesList
-		self.reactionList = reactionList
+										   fragment_smiles_path,
+										   cache_dir,
+										   compact,
+										   mechanism,
+										   pseudo_rxn_path)
+
+		self.speciesList = self.mechanism.species_list
+		self.reactionList = self.mechanism.reaction_list
 		self.temperature = temperature # unit: K
 		self.pressure = pressure # unit: bar
 		self.outputDirectory = outputDirectory
@@ -197,7 +224,8 @@ class OdeSimulator(Simulator):
 			moles_dict[spe_label] = max(data.data[-1]*total_moles[-1],0)
 
 		# prepare moles data for re-attachment
-		r_moles, l_moles, r_l_moles, remain_moles, rr_ll_list = categorize_fragments(moles_dict)
+		r_moles, l_moles, r_l_moles, remain_moles, rr_ll_list = categorize_fragments(moles_dict, 
+																					 self.property_table)
 
 		matches = self.reattach_fragments(r_moles, 
 										  l_moles, 
@@ -216,15 +244,7 @@ class OdeSimulator(Simulator):
 		final_frags_moles.extend(flattened_matches)
 
 		# calculate fragmental weight distribution
-		fragmental_weight_distri = []
-		for final_frag_mole in final_frags_moles:
-			sub_frag_labels, mole = final_frag_mole
-			total_frag_weight = 0
-			for sub_frag_label in sub_frag_labels:
-				sub_frag = self.fragment_dict[sub_frag_label]
-				total_frag_weight += sub_frag.getMolecularWeight()
-			
-			fragmental_weight_distri.append((total_frag_weight, mole))
+		fragmental_weight_distri = self.calculate_fragmental_weights(final_frags_moles)
 
 		return fragmental_weight_distri
 
@@ -264,36 +284,56 @@ class OdeSimulator(Simulator):
 		final_frags_moles.extend(flattened_matches)
 
 		# calculate fragmental weight distribution
-		fragmental_weight_distri_1_label = []
-		for final_frag_mole in final_frags_moles:
-			sub_frag_labels, mole = final_frag_mole
-			total_frag_weight = 0
-			for sub_frag_label in sub_frag_labels:
-				sub_frag = self.fragment_dict[sub_frag_label]
-				total_frag_weight += sub_frag.getMolecularWeight()
-
-			fragmental_weight_distri_1_label.append((total_frag_weight, mole))
+		fragmental_weight_distri_1_label = self.calculate_fragmental_weights(final_frags_moles)
 
 		return fragmental_weight_distri_1_label
 
+	def calculate_fragmental_weights(self, final_frags_moles):
+		"""
+		Given a list of (fragment label tuple, moles) pairs, return
+		a list of (total fragmental weight, moles) pairs. Weights are
+		summed from the library property table in one NumPy pass.
+		"""
+		sub_frag_labels_list = [final_frag_mole[0] for final_frag_mole in final_frags_moles]
+		total_frag_weights = self.property_table.get_total_weights(sub_frag_labels_list)
 
-def categorize_fragments(moles_dict):
+		fragmental_weight_distri = []
+		for total_frag_weight, final_frag_mole in zip(total_frag_weights, final_frags_moles):
+			fragmental_weight_distri.append((float(total_frag_weight), final_frag_mole[1]))
 
+		return fragmental_weight_distri
+
+
+def categorize_fragments(moles_dict, property_table=None):
+	"""
+	Sort fragments into single-labeled, double-labeled and remaining
+	ones. Cutting label counts and radical flags are read from 
+	`property_table` if given, otherwise they are inferred from the 
+	fragment labels.
+	"""
 	r_moles = []
 	l_moles = []
 	r_l_moles = []
 	rr_ll_list = []
 	remain_moles = []
 	for spe_label in moles_dict:
-		if '*' in spe_label:
+		if property_table is not None and spe_label in property_table.label_to_id:
+			frag_id = property_table.label_to_id[spe_label]
+			is_radical = property_table.radical_flags[frag_id]
+			r_count = property_table.r_counts[frag_id]
+			l_count = property_table.l_counts[frag_id]
+		else:
+			is_radical = '*' in spe_label
+			r_count = spe_label.count('R')
+			l_count = spe_label.count('L')
+
+		if is_radical:
 			remain_moles.append((spe_label, moles_dict[spe_label]))
 			continue
 		if abs(moles_dict[spe_label]) <= 1e-6:
 			remain_moles.append((spe_label, moles_dict[spe_label]))
 			continue
 		
-		r_count = spe_label.count('R')
-		l_count = spe_label.count('L')
 		label_count = r_count + l_count
 		
 		if label_count == 0:
@@ -365,35 +405,68 @@ class MonteCarloSimulator(Simulator):
 				fragment_smiles_path,
 				initial_molecules,
 				volume, 
-				temperature):
+				temperature,
+				cache_dir=None,
+				compact=False,
+				mechanism=None,
+				pseudo_rxn_path=None):
 		super(MonteCarloSimulator, self).__init__(chemkin_path, 
 												  dictionary_path,
-												  fragment_smiles_path)
+												  fragment_smiles_path,
+												  cache_dir,
+												  compact,
+												  mechanism,
+												  pseudo_rxn_path)
+
+		# fractional products, e.g., of pseudo reactions like
+		# RCC == RC + 0.25 RCCCCR, are only supported by the
+		# ODE right-hand side of the network, see get_rhs
+		stoichiometry = self.network.stoichiometry
+		if np.any(stoichiometry.data != np.round(stoichiometry.data)):
+			raise Exception('Monte Carlo simulations need integer stoichiometric coefficients, fractional products are only supported by FragmentReactionNetwork.get_rhs.')
+		self.stoichiometry = stoichiometry.astype(np.int64)
 
 		self.initialize_fragment_counts(initial_molecules)
 
 		self.initialize_molecule_fragment_df(initial_molecules)
 		self.volume = volume # unit: m^3
 		self.temperature = temperature
-		self.reaction_flux_array = np.zeros(len(self.fragment_reaction_list))
+		self.reaction_flux_array = np.zeros(len(self.network))
+
+		# rate coefficients at the fixed temperature, in one batch
+		self.network.get_rate_coefficients(self.temperature)
+
+	@property
+	def fragment_count_dict(self):
+		"""
+		The fragment counts by label, a live view of `fragment_count_array`,
+		the integer counts by fragment id; e.g., `fragment_count_dict[label] += 1`
+		changes the array. Assigning a dictionary replaces all the counts.
+		"""
+		return afm.network.FragmentCountView(self.fragment_count_array, self.network)
+
+	@fragment_count_dict.setter
+	def fragment_count_dict(self, count_dict):
+
+		self.fragment_count_array = self.network.get_count_array(count_dict, dtype=np.int64)
 
 	def initialize_fragment_counts(self, initial_molecules):
 
 		# initialize the fragment_count
-		self.fragment_count_dict = dict(zip(self.fragment_dict.keys(), 
-											[0]*len(self.fragment_dict)))
+		label_to_id = self.network.label_to_id
+		self.fragment_count_array = np.zeros(len(self.network.labels), dtype=np.int64)
 
 		for mol in initial_molecules:
 			for frag in mol.composition:
-				self.fragment_count_dict[frag] += mol.composition[frag]
+				self.fragment_count_array[label_to_id[frag]] += mol.composition[frag]
 
 	def initialize_molecule_fragment_df(self, initial_molecules):
 
-		self.molecule_fragment_df = pd.DataFrame(columns=self.fragment_count_dict.keys())
+		self.molecule_fragment_df = pd.DataFrame(columns=self.network.labels)
 
 		for mol in initial_molecules:
 			insert_row = {}
-			for fragment_label  in self.fragment_count_dict:
+			for fragment_label  in self.network.labels:
 				if fragment_label in mol.composition:
 					insert_row[fragment_label] = mol.composition[fragment_label]
 				else:
@@ -411,9 +484,9 @@ class MonteCarloSimulator(Simulator):
 	######################
 	def calculate_unimolucular_rate(self, reaction):
 
-		k_u = reaction.kinetics.getRateCoefficient(self.temperature)
+		k_u = reaction.get_rate_coefficient(self.temperature)
 		frag_label = reaction.reactants[0].label
-		frag_count = self.fragment_count_dict[frag_label]
+		frag_count = self.fragment_count_array[self.network.label_to_id[frag_label]]
 		rate_u = k_u * frag_count # unit: 1/s
 
 		return rate_u
@@ -421,28 +494,22 @@ class MonteCarloSimulator(Simulator):
 	def calculate_bimolucular_rate(self, reaction):
 
 		Na = rmgpy.constants.Na
-		k_b = reaction.kinetics.getRateCoefficient(self.temperature)/Na # unit: m^3/s
+		k_b = reaction.get_rate_coefficient(self.temperature)/Na # unit: m^3/s
 		frag_label1 = reaction.reactants[0].label
 		frag_label2 = reaction.reactants[1].label
 
-		frag_count1 = self.fragment_count_dict[frag_label1]
-		frag_count2 = self.fragment_count_dict[frag_label2]
+		frag_count1 = self.fragment_count_array[self.network.label_to_id[frag_label1]]
+		frag_count2 = self.fragment_count_array[self.network.label_to_id[frag_label2]]
 		rate_b = k_b * frag_count1 * frag_count2 / self.volume # unit: 1/s
 
 		return rate_b
 
 	def update_reaction_fluxes(self):
 
-		for idx, frag_rxn in enumerate(self.fragment_reaction_list):
-			# unimolecular reactions
-			if len(frag_rxn.reactants) == 1:
-				rate = self.calculate_unimolucular_rate(frag_rxn)
-
-			# bimolecular reactions
-			elif len(frag_rxn.reactants) == 2:
-				rate = self.calculate_bimolucular_rate(frag_rxn)
-
-			self.reaction_flux_array[idx] = rate
+		# unimolecular and bimolecular rates of all the reactions at once
+		self.reaction_flux_array = self.network.get_propensities(self.fragment_count_array,
+																 self.temperature,
+																 self.volume)
 
 	def time_step(self):
 
@@ -459,20 +526,13 @@ class MonteCarloSimulator(Simulator):
 
 		# pick the one fragment reaction
 		# indicated by the random number
-		current_fluxsum = 0
-		for idx, flux in enumerate(self.reaction_flux_array):
-
-			current_fluxsum += flux
-			print current_fluxsum
-			if current_fluxsum >= rand_num:
-				return idx
+		fluxsums = np.cumsum(self.reaction_flux_array)
+		idx = int(np.searchsorted(fluxsums, rand_num))
+		if idx < len(fluxsums):
+			return idx
 
 	def update_fragment_counts(self, reaction_idx):
 
-		reaction = self.fragment_reaction_list[reaction_idx]
-		for reactant in reaction.reactants:
-			self.fragment_count_dict[reactant.label] -= 1
-
-		for product in reaction.products:
-			self.fragment_count_dict[product.label] += 1
+		stoichiometry = self.stoichiometry[:, reaction_idx]
+		self.fragment_count_array[stoichiometry.indices] += stoichiometry.data
 
@@ -0,0 +1,134 @@
+import math
+
+import rmgpy.constants as constants
+from rmgpy.thermo import NASA
+from rmgpy.thermo.thermoengine import processThermoData
+
+import afm.cache
+
+# fragments whose entropy is corrected by R ln 2 for the
+# symmetry of their cutting labels
+SYMMETRY_CORRECTED_LABELS = ('RCCCCR', 'LCCCCR', 'LCCCCL')
+
+class FragmentThermoCache(object):
+    """
+    A memo of the NASA thermo of fragments, estimated for their
+    representative species, keyed by the canonical fragment key and the
+    thermo database version so that the estimation runs once per unique
+    fragment and database:
+
+    =============================== ================================================
+    Attribute                       Description
+    =============================== ================================================
+    `thermo_database`               The RMG thermo database used for the estimation
+    `database_version`              A string identifying `thermo_database`, see
+                                    :func:`afm.generator.get_thermo_database_version`
+    `symmetry_corrected_labels`     The labels of the fragments whose S298 is
+                                    corrected by R ln 2 before the NASA fit
+    `thermo`                        A dictionary of (NASA thermo, symmetry number)
+                                    by (canonical key, corrected flag, database
+                                    version)
+    =============================== ================================================
+
+    A persisted cache thus only returns the thermo estimated with
+    the same thermo database, e.g., the same thermo libraries.
+    """
+
+    def __init__(self, thermo_database=None, symmetry_corrected_labels=SYMMETRY_CORRECTED_LABELS,
+                 thermo=None, database_version=None):
+        self.thermo_database = thermo_database
+        self.database_version = database_version
+        self.symmetry_corrected_labels = set(symmetry_corrected_labels)
+        self.thermo = thermo or {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.thermo)
+
+    def __contains__(self, fragment):
+        """
+        Return ``True`` if the thermo of `fragment` is cached, i.e., it
+        can be returned without the thermo database.
+        """
+        return self.get_key(fragment) in self.thermo
+
+    def __reduce__(self):
+        """
+        A helper function used when pickling the object; the thermo
+        database is not pickled.
+        """
+        return (FragmentThermoCache, (None, self.symmetry_corrected_labels, self.thermo))
+
+    def get_key(self, fragment):
+        """
+        Return the key of the thermo of `fragment` in `thermo`.
+        """
+        corrected = fragment.label in self.symmetry_corrected_labels
+        return (fragment.canonical_key, corrected, self.database_version)
+
+    def get_thermo(self, fragment):
+        """
+        Return the NASA thermo of the representative species of `fragment`,
+        estimating it on a miss, and set the symmetry number of the species.
+        """
+        fragment.assign_representative_species()
+        species = fragment.species_repr
+        key = self.get_key(fragment)
+
+        cached = self.thermo.get(key)
+        if cached is None:
+            self.misses += 1
+            thermo0 = self.thermo_database.getThermoData(species)
+            if key[1]:
+                thermo0.S298.value_si += constants.R * math.log(2)
+            cached = (processThermoData(species, thermo0, NASA), species.getSymmetryNumber())
+            self.thermo[key] = cached
+        else:
+            self.hits += 1
+            species.symmetryNumber = cached[1]
+
+        return cached[0]
+
+    def assign_thermo(self, fragments):
+        """
+        Set the thermo of the representative species of `fragments`.
+        """
+        for frag in fragments:
+            frag.species_repr.thermo = self.get_thermo(frag)
+
+    def assign_species_thermo(self, species_list, fragments_dict):
+        """
+        Set the thermo of species labeled by fragment labels, e.g., the
+        reactants and products of generated reactions, from the thermo
+        of the fragments in `fragments_dict`.
+        """
+        for species in species_list:
+            species.thermo = self.get_thermo(fragments_dict[species.label])
+
+def load_thermo_cache(fragment_smiles_path, cache_dir, thermo_database, database_version=None,
+                      symmetry_corrected_labels=SYMMETRY_CORRECTED_LABELS):
+    """
+    Return the thermo cache stored next to the fragment library cache
+    of `fragment_smiles_path`, or an empty one on a cache miss, using
+    `thermo_database`, identified by `database_version`, for lookups
+    and new estimations.
+    """
+    cache_path = afm.cache.get_cache_path(cache_dir, 'thermo', fragment_smiles_path)
+    thermo_cache = afm.cache.load_cache(cache_path)
+    if thermo_cache is None:
+        return FragmentThermoCache(thermo_database, symmetry_corrected_labels,
+                                   database_version=database_version)
+
+    thermo_cache.thermo_database = thermo_database
+    thermo_cache.database_version = database_version
+    thermo_cache.symmetry_corrected_labels = set(symmetry_corrected_labels)
+    return thermo_cache
+
+def save_thermo_cache(fragment_smiles_path, cache_dir, thermo_cache):
+    """
+    Store `thermo_cache` next to the fragment library cache
+    of `fragment_smiles_path`.
+    """
+    cache_path = afm.cache.get_cache_path(cache_dir, 'thermo', fragment_smiles_path)
+    afm.cache.save_cache(cache_path, thermo_cache)
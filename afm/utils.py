@@ -309,3 +309,85 @@ def read_frag_mech(frag_mech_path):
 				reaction_string_dict[reaction_string]= [reactant_strings, product_strings]
 
 	return reaction_string_dict
+
+def read_frag_mech_by_family(frag_mech_path):
+	"""
+	Read a text fragment mechanism whose reactions are listed under
+	`# Header: Family` lines and return a list of (family label,
+	reaction strings) tuples in the order of the file. Reactions
+	under repeated headers of a family are merged into its first entry.
+	"""
+	families = []
+	reaction_strings_by_family = {}
+	current_family = ''
+	with open(frag_mech_path) as f_in:
+		for line in f_in:
+			if line.startswith('#') and ':' in line:
+				_, current_family = [token.strip() for token in line.split(':')]
+			elif line.strip() and not line.startswith('#'):
+				if current_family not in reaction_strings_by_family:
+					families.append(current_family)
+					reaction_strings_by_family[current_family] = []
+				reaction_strings_by_family[current_family].append(line.strip())
+
+	return [(family, reaction_strings_by_family[family]) for family in families]
+
+def parse_pseudo_reaction_string(reaction_string):
+	"""
+	Parse a pseudo reaction line, e.g., `RCC == RC + 0.25 RCCCCR`,
+	optionally followed by the Arrhenius parameters `A n Ea` in the
+	Chemkin units cm, mol, s and kcal/mol. Return the reactants and
+	the products as lists of (coefficient, label) tuples, and the
+	(A, n, Ea) tuple or ``None`` if no parameters are given.
+	"""
+	tokens = reaction_string.split()
+	arrhenius = None
+	if len(tokens) > 3 and all([is_number(token) for token in tokens[-3:]]):
+		arrhenius = tuple([float(token) for token in tokens[-3:]])
+		tokens = tokens[:-3]
+
+	reactant_strings, product_strings = parse_reaction_string(' '.join(tokens))
+
+	return ([parse_stoichiometric_term(term) for term in reactant_strings],
+			[parse_stoichiometric_term(term) for term in product_strings],
+			arrhenius)
+
+def parse_stoichiometric_term(term):
+	"""
+	Return the (coefficient, label) tuple of a reaction term,
+	e.g., (0.25, 'RCCCCR') for `0.25 RCCCCR` and (1.0, 'RC')
+	for `RC`.
+	"""
+	tokens = term.split()
+	if len(tokens) == 1:
+		return 1.0, tokens[0]
+	elif len(tokens) == 2 and is_number(tokens[0]):
+		return float(tokens[0]), tokens[1]
+	else:
+		raise Exception('Cannot parse reaction term: {0}'.format(term))
+
+def is_number(token):
+	"""
+	Return ``True`` if the string `token` can be converted
+	to a float, e.g., an Arrhenius parameter of a pseudo
+	reaction line, or ``False`` otherwise.
+	"""
+	try:
+		float(token)
+	except ValueError:
+		return False
+	return True
+
+def read_pseudo_rxn(pseudo_rxn_path):
+	"""
+	Read a pseudo reaction file, e.g., `common_rules/pseudo_rxn.txt`,
+	and return the parsed reactions (see :func:`parse_pseudo_reaction_string`)
+	in the order of the file. Commented lines are skipped.
+	"""
+	pseudo_reactions = []
+	with open(pseudo_rxn_path) as f_in:
+		for line in f_in:
+			if line.strip() and not line.startswith('#'):
+				pseudo_reactions.append(parse_pseudo_reaction_string(line.strip()))
+
+	return pseudo_reactions
@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import afm.cache
+import afm.loader
+import afm.fragment
+
+class TestFragmentLibraryCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A function run before each unit test in this class.
+        """
+        self.cache_dir = tempfile.mkdtemp()
+        self.fragment_smiles_path = os.path.join(os.path.dirname(__file__),
+                                    'data',
+                                    'loader_data',
+                                    'fragment_smiles.txt')
+
+    def tearDown(self):
+        """
+        A function run after each unit test in this class.
+        """
+        shutil.rmtree(self.cache_dir)
+
+    def test_load_fragments_with_cache(self):
+
+        fragments_dict = afm.loader.load_fragments(self.fragment_smiles_path,
+                                                   cache_dir=self.cache_dir)
+        cache_path = afm.cache.get_cache_path(self.cache_dir,
+                                              'fragment_library',
+                                              self.fragment_smiles_path)
+        self.assertTrue(os.path.exists(cache_path))
+
+        cached_fragments_dict = afm.loader.load_fragments(self.fragment_smiles_path,
+                                                          cache_dir=self.cache_dir)
+
+        self.assertEqual(sorted(fragments_dict.keys()), sorted(cached_fragments_dict.keys()))
+        for label, frag in fragments_dict.iteritems():
+            cached_frag = cached_fragments_dict[label]
+            self.assertIsNot(frag, cached_frag)
+            self.assertTrue(frag.isIsomorphic(cached_frag))
+            self.assertEqual(label, cached_frag.species_repr.label)
+            self.assertAlmostEqual(frag.getMolecularWeight(), cached_frag.getMolecularWeight(), 10)
+            self.assertIsNotNone(cached_frag.property_table)
+
+            # rebuilding the species of the restored fragment keeps its label
+            cached_frag.assign_representative_species()
+            self.assertEqual(label, cached_frag.species_repr.label)
+            self.assertTrue(cached_frag.species_repr.molecule[0].isIsomorphic(cached_frag.mol_repr))
+
+    def test_cache_key_follows_file_content(self):
+
+        fragment_smiles_path = os.path.join(self.cache_dir, 'fragment_smiles.txt')
+        with open(fragment_smiles_path, 'w') as f_out:
+            f_out.write('RCCR: RCCR\n')
+        cache_path1 = afm.cache.get_cache_path(self.cache_dir,
+                                               'fragment_library',
+                                               fragment_smiles_path)
+
+        with open(fragment_smiles_path, 'a') as f_out:
+            f_out.write('RCC: RCC\n')
+        cache_path2 = afm.cache.get_cache_path(self.cache_dir,
+                                               'fragment_library',
+                                               fragment_smiles_path)
+
+        self.assertNotEqual(cache_path1, cache_path2)
+
+    def test_load_cache_miss(self):
+
+        cache_path = os.path.join(self.cache_dir, 'missing.pkl')
+        self.assertIsNone(afm.cache.load_cache(cache_path))
+
+        with open(cache_path, 'w') as f_out:
+            f_out.write('not a pickle')
+        self.assertIsNone(afm.cache.load_cache(cache_path))
+
+    def test_load_chemkin_file_with_cache(self):
+
+        chemkin_path = os.path.join(os.path.dirname(self.fragment_smiles_path), 'chem.inp')
+        dictionary_path = os.path.join(os.path.dirname(self.fragment_smiles_path),
+                                       'species_dictionary.txt')
+
+        species_list, reaction_list = afm.loader.load_chemkin_file(chemkin_path,
+                                                                   dictionary_path,
+                                                                   cache_dir=self.cache_dir)
+        self.assertIsNotNone(afm.cache.load_chemkin_cache(chemkin_path,
+                                                          dictionary_path,
+                                                          self.cache_dir))
+
+        cached_species_list, cached_reaction_list = afm.loader.load_chemkin_file(chemkin_path,
+                                                                                 dictionary_path,
+                                                                                 cache_dir=self.cache_dir)
+
+        self.assertEqual([spe.label for spe in species_list],
+                         [spe.label for spe in cached_species_list])
+        self.assertEqual([str(rxn) for rxn in reaction_list],
+                         [str(rxn) for rxn in cached_reaction_list])
+        for rxn, cached_rxn in zip(reaction_list, cached_reaction_list):
+            self.assertAlmostEqual(rxn.kinetics.getRateCoefficient(1000),
+                                   cached_rxn.kinetics.getRateCoefficient(1000))
+
+class TestResonanceCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A function run before each unit test in this class.
+        """
+        self.cache_dir = tempfile.mkdtemp()
+        self.fragment_smiles_path = os.path.join(self.cache_dir, 'fragment_smiles.txt')
+        with open(self.fragment_smiles_path, 'w') as f_out:
+            f_out.write('RCc1ccccc1: RCc1ccccc1\n')
+            f_out.write('RCCR: RCCR\n')
+
+    def tearDown(self):
+        """
+        A function run after each unit test in this class.
+        """
+        shutil.rmtree(self.cache_dir)
+
+    def test_aromatic_structure_first(self):
+
+        fragments_dict = afm.loader.load_fragments(self.fragment_smiles_path)
+        resonance_cache = afm.cache.ResonanceCache()
+        resonance_cache.assign_resonance_structures(fragments_dict.values())
+
+        molecules = fragments_dict['RCc1ccccc1'].species_repr.molecule
+        self.assertEqual(1, len(molecules))
+        self.assertTrue(molecules[0].isAromatic())
+        self.assertEqual(2, resonance_cache.misses)
+
+        # an isomorphic fragment hits the cache
+        frag = afm.fragment.Fragment(label='RCc1ccccc1').from_SMILES_like_string('c1ccccc1CR')
+        resonance_cache.assign_resonance_structures([frag])
+        self.assertEqual(1, resonance_cache.hits)
+        self.assertTrue(frag.species_repr.molecule[0].isIsomorphic(molecules[0]))
+
+    def test_persistence(self):
+
+        fragments_dict = afm.loader.load_fragments(self.fragment_smiles_path)
+        resonance_cache = afm.cache.load_resonance_cache(self.fragment_smiles_path, self.cache_dir)
+        self.assertEqual(0, len(resonance_cache))
+
+        resonance_cache.assign_resonance_structures(fragments_dict.values())
+        afm.cache.save_resonance_cache(self.fragment_smiles_path, self.cache_dir, resonance_cache)
+
+        resonance_cache = afm.cache.load_resonance_cache(self.fragment_smiles_path, self.cache_dir)
+        self.assertEqual(2, len(resonance_cache))
+        resonance_cache.assign_resonance_structures(fragments_dict.values())
+        self.assertEqual(2, resonance_cache.hits)
+        self.assertEqual(0, resonance_cache.misses)
@@ -0,0 +1,42 @@
+import unittest
+
+from rmgpy.species import Species
+from rmgpy.thermo import NASA, NASAPolynomial
+from rmgpy.chemkin import readThermoEntry
+
+import afm.chemkin
+import afm.fragment
+
+class TestChemkin(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A function run before each unit test in this class.
+        """
+        self.frag = afm.fragment.Fragment(label='ArCCCR').from_SMILES_like_string('c1ccccc1CCCR')
+        self.thermo = NASA(polynomials=[NASAPolynomial(coeffs=[3.0, 1e-3, 1e-6, -1e-9, 1e-12, 1000.0, 5.0],
+                                                       Tmin=(300, 'K'), Tmax=(1000, 'K')),
+                                        NASAPolynomial(coeffs=[4.0, 2e-3, -1e-6, 1e-10, -1e-14, 900.0, 2.0],
+                                                       Tmin=(1000, 'K'), Tmax=(5000, 'K'))],
+                           Tmin=(300, 'K'), Tmax=(5000, 'K'))
+
+    def test_get_chemkin_element_counts(self):
+
+        # the ethyl cap of the cutting label is not counted
+        element_counts = afm.chemkin.get_chemkin_element_counts(self.frag)
+        self.assertEqual([('C', 9), ('H', 11)], element_counts)
+
+        self.frag.assign_representative_molecule()
+        self.assertEqual('C11H16', self.frag.mol_repr.getFormula())
+
+    def test_write_thermo_entry(self):
+
+        species = Species(label='ArCCCR', thermo=self.thermo)
+        element_counts = afm.chemkin.get_chemkin_element_counts(self.frag)
+        entry = afm.chemkin.write_thermo_entry(species, element_counts, verbose=False)
+
+        label, thermo, formula = readThermoEntry(entry)
+        self.assertEqual('ArCCCR', label)
+        self.assertEqual({'C': 9, 'H': 11}, formula)
+        self.assertAlmostEqual(self.thermo.getEnthalpy(800), thermo.getEnthalpy(800), 2)
+        self.assertAlmostEqual(self.thermo.getEntropy(1500), thermo.getEntropy(1500), 4)
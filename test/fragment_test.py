@@ -1,4 +1,5 @@
 import os
+import pickle
 import unittest
 
 from rmgpy.species import Species
@@ -37,6 +38,13 @@ class TestCuttingLabel(unittest.TestCase):
         self.assertEqual(self.cutting_label_R.isotope, 
                          cutting_label_R_copy.isotope)
 
+    def test_pickle(self):
+
+        cutting_label_R_copy = pickle.loads(pickle.dumps(self.cutting_label_R, -1))
+
+        self.assertIsInstance(cutting_label_R_copy, afm.fragment.CuttingLabel)
+        self.assertEqual('R', cutting_label_R_copy.name)
+
 class TestFragment(unittest.TestCase):
 
     def setUp(self):
@@ -258,6 +266,195 @@ class TestFragment(unittest.TestCase):
 
         self.assertTrue(expected_fragment.isIsomorphic(fragment))
 
+    def test_from_SMILES_like_string4(self):
+
+        # more than 9 cutting labels, with numbered names
+        smiles_like = 'R' + 'C(L)'*10 + 'R1'
+        fragment = afm.fragment.Fragment().from_SMILES_like_string(smiles_like)
+
+        cutting_label_count = fragment.get_cutting_label_count()
+        self.assertEqual({'R': 1, 'L': 10, 'R1': 1}, cutting_label_count)
+        self.assertEqual({'C': 10, 'H': 10}, fragment.get_element_count())
+
+    def test_to_labeled_SMILES(self):
+
+        # labels inside brackets are left untouched
+        self.assertEqual('[82*]C[Cl]C[76*]', afm.fragment.to_labeled_SMILES('RC[Cl]CL'))
+        self.assertEqual('R1', afm.fragment.get_cutting_label_name(
+                                    afm.fragment.get_cutting_label_isotope('R1')))
+
+    def test_toSMILES(self):
+
+        # cutting labels are written as hydrogens
+        fragment = afm.fragment.Fragment().from_SMILES_like_string('RCCR')
+        self.assertEqual('CC', fragment.toSMILES())
+
+        fragment = afm.fragment.Fragment().from_SMILES_like_string('c1ccccc1CR')
+        smiles = fragment.toSMILES()
+        self.assertEqual('Cc1ccccc1', smiles)
+        self.assertIs(smiles, fragment.toSMILES())
+
+        # the memo is reset when the graph changes
+        fragment = afm.fragment.Fragment().from_SMILES_like_string('[CH2]CR')
+        self.assertEqual('[CH2]C', fragment.toSMILES())
+        fragment.saturate_radicals()
+        self.assertEqual('CC', fragment.toSMILES())
+
+        # the SMILES property keeps the cutting labels of the input
+        fragment = afm.fragment.Fragment(SMILES='RCCL')
+        self.assertEqual('RCCL', fragment.SMILES)
+        self.assertEqual('CC', fragment.toSMILES())
+        fragment.update()
+        self.assertEqual(fragment.canonical_key,
+                         afm.fragment.Fragment().from_SMILES_like_string(fragment.SMILES).canonical_key)
+
+    def test_fragments_from_SMILES_like_strings(self):
+
+        fragments = afm.fragment.fragments_from_SMILES_like_strings(['RCCL', 'RCL'],
+                                                                    labels=['RCCL', 'RCL'])
+
+        self.assertEqual(['RCCL', 'RCL'], [frag.label for frag in fragments])
+        expected_fragment = afm.fragment.Fragment().from_SMILES_like_string('RCL')
+        self.assertTrue(expected_fragment.isIsomorphic(fragments[1]))
+
+    def test_pickle(self):
+
+        fragment = afm.fragment.Fragment(label='RCCL').from_SMILES_like_string('RCCL')
+        fragment.assign_representative_species()
+
+        fragment_copy = pickle.loads(pickle.dumps(fragment, -1))
+
+        self.assertIsInstance(fragment_copy, afm.fragment.Fragment)
+        self.assertEqual('RCCL', fragment_copy.label)
+        self.assertEqual(fragment.multiplicity, fragment_copy.multiplicity)
+        self.assertTrue(fragment.isIsomorphic(fragment_copy))
+        self.assertTrue(fragment.species_repr.isIsomorphic(fragment_copy.species_repr))
+
+    def test_compact_state(self):
+
+        fragment = afm.fragment.Fragment(label='ArCC*').from_SMILES_like_string('c1ccccc1C[CH]R')
+
+        state = fragment.get_compact_state()
+        self.assertEqual(('R',), state['label_names'])
+        self.assertEqual(len(fragment.vertices), len(state['codes']))
+
+        fragment_copy = afm.fragment.fragment_from_compact_state(state)
+
+        # vertex order, attributes and bonds are kept exactly
+        for vertex, vertex_copy in zip(fragment.vertices, fragment_copy.vertices):
+            self.assertEqual(vertex.symbol, vertex_copy.symbol)
+            self.assertEqual(vertex.radicalElectrons, vertex_copy.radicalElectrons)
+            self.assertEqual(len(vertex.edges), len(vertex_copy.edges))
+            if isinstance(vertex, Atom):
+                self.assertIs(vertex.atomType, vertex_copy.atomType)
+                self.assertEqual(vertex.lonePairs, vertex_copy.lonePairs)
+
+        for i, vertex1 in enumerate(fragment.vertices):
+            for j, vertex2 in enumerate(fragment.vertices):
+                if fragment.hasBond(vertex1, vertex2):
+                    bond_copy = fragment_copy.getBond(fragment_copy.vertices[i], fragment_copy.vertices[j])
+                    self.assertEqual(fragment.getBond(vertex1, vertex2).order, bond_copy.order)
+
+        self.assertEqual(fragment.multiplicity, fragment_copy.multiplicity)
+        self.assertEqual(fragment.canonical_key, fragment_copy.canonical_key)
+
+    def test_fingerprint1(self):
+
+        # fragment built by hand gets its fingerprint on demand
+        self.assertEqual(self.fragment1.fingerprint, self.fragment2.fingerprint)
+
+        fragment_RR = afm.fragment.Fragment().from_SMILES_like_string('RCCR')
+        fragment_RL = afm.fragment.Fragment().from_SMILES_like_string('RCCL')
+        self.assertNotEqual(fragment_RR.fingerprint, fragment_RL.fingerprint)
+        self.assertFalse(fragment_RR.isIsomorphic(fragment_RL))
+
+    def test_fingerprint2(self):
+
+        # fingerprint is invalidated when the graph changes
+        fragment = afm.fragment.Fragment().from_SMILES_like_string('CR')
+        fingerprint_before = fragment.fingerprint
+
+        atom_H = Atom(element=getElement('H'), 
+                    radicalElectrons=0, 
+                    charge=0, 
+                    lonePairs=0)
+        fragment.addAtom(atom_H)
+
+        self.assertNotEqual(fingerprint_before, fragment.fingerprint)
+
+    def test_canonical_key1(self):
+
+        # fragments built by hand and from SMILES-like
+        # string share the same key
+        atom_C = Atom(element=getElement('C'), 
+                    radicalElectrons=0, 
+                    charge=0, 
+                    lonePairs=0)
+
+        atom_H1 = Atom(element=getElement('H'), 
+                    radicalElectrons=0, 
+                    charge=0, 
+                    lonePairs=0)
+
+        atom_H2 = Atom(element=getElement('H'), 
+                    radicalElectrons=0, 
+                    charge=0, 
+                    lonePairs=0)
+
+        cutting_label_R = afm.fragment.CuttingLabel('R')
+        cutting_label_L = afm.fragment.CuttingLabel('L')
+
+        vertices = [
+            cutting_label_L,
+            atom_H1,
+            atom_C,
+            atom_H2,
+            cutting_label_R
+        ]
+
+        bonds = [
+            Bond(atom_C, cutting_label_R, 1),
+            Bond(atom_C, cutting_label_L, 1),
+            Bond(atom_C, atom_H1, 1),
+            Bond(atom_C, atom_H2, 1)
+        ]
+
+        fragment = afm.fragment.Fragment()
+        for vertex in vertices: fragment.addVertex(vertex)
+        for bond in bonds: fragment.addEdge(bond)
+
+        fragment1 = afm.fragment.Fragment().from_SMILES_like_string('RCL')
+
+        self.assertEqual(fragment.canonical_key, fragment1.canonical_key)
+
+        # so do the SMILES-like strings of the same fragment
+        fragment2 = afm.fragment.Fragment().from_SMILES_like_string('RCCL')
+        fragment3 = afm.fragment.Fragment().from_SMILES_like_string('LCCR')
+
+        self.assertEqual(fragment2.canonical_key, fragment3.canonical_key)
+
+    def test_canonical_key2(self):
+
+        # cutting labels are part of the key
+        fragment_RR = afm.fragment.Fragment().from_SMILES_like_string('RCCR')
+        fragment_RL = afm.fragment.Fragment().from_SMILES_like_string('RCCL')
+        fragment_R = afm.fragment.Fragment().from_SMILES_like_string('RCC')
+
+        self.assertNotEqual(fragment_RR.canonical_key, fragment_RL.canonical_key)
+        self.assertNotEqual(fragment_RR.canonical_key, fragment_R.canonical_key)
+
+    def test_canonical_key3(self):
+
+        # key is invalidated when the graph changes
+        fragment = afm.fragment.Fragment().from_SMILES_like_string('[CH2]CR')
+        key_before = fragment.canonical_key
+        fragment.saturate_radicals()
+        fragment.update()
+
+        expected_fragment = afm.fragment.Fragment().from_SMILES_like_string('CCR')
+        self.assertNotEqual(key_before, fragment.canonical_key)
+        self.assertEqual(expected_fragment.canonical_key, fragment.canonical_key)
+
     def test_isSubgraphIsomorphic1(self):
 
         from rmgpy.molecule.group import Group
@@ -360,6 +557,33 @@ class TestFragment(unittest.TestCase):
 
         self.assertTrue(expected_repr_mol.isIsomorphic(fragment.mol_repr))
 
+    def test_assign_representative_molecule_cache(self):
+
+        smiles_like = 'RCR'
+        fragment = afm.fragment.Fragment().from_SMILES_like_string(smiles_like)
+
+        cache_info = afm.fragment.representative_cache_info
+        hits_before = cache_info['hits']
+        misses_before = cache_info['misses']
+
+        fragment.assign_representative_species()
+        mol_repr = fragment.mol_repr
+        species_repr = fragment.species_repr
+
+        # second call hits the cache
+        fragment.assign_representative_species()
+        self.assertIs(mol_repr, fragment.mol_repr)
+        self.assertIs(species_repr, fragment.species_repr)
+        self.assertEqual(hits_before + 1, cache_info['hits'])
+        self.assertEqual(misses_before + 1, cache_info['misses'])
+
+        # cache is invalidated when the graph changes
+        fragment.update()
+        fragment.assign_representative_species()
+        self.assertIsNot(mol_repr, fragment.mol_repr)
+        self.assertIsNot(species_repr, fragment.species_repr)
+        self.assertEqual(misses_before + 2, cache_info['misses'])
+
     def test_getMolecularWeight1(self):
 
         fragmental_weight = self.fragment1.getMolecularWeight()
@@ -628,6 +852,18 @@ class TestFragment(unittest.TestCase):
         self.assertEqual(aromaticRing_atomSet, expected_aromaticRing_atomSet)
         self.assertEqual(aromaticBonds_set, expected_aromaticBonds_set)
 
+        # the result is memoized, also when the vertices are reordered
+        self.assertIs(aromaticRings, fragment.getAromaticRings()[0])
+        fragment.vertices.reverse()
+        self.assertIs(aromaticRings, fragment.getAromaticRings()[0])
+
+        # and recomputed when bond orders are changed in place
+        for bond in aromaticBonds[0]:
+            bond.order = 1.5
+        aromaticRings1, _ = fragment.getAromaticRings()
+        self.assertIsNot(aromaticRings, aromaticRings1)
+        self.assertEqual(len(aromaticRings1), 1)
+
     def test_generate_resonance_structures1(self):
 
         adj = """1  C u0 p0 c0 {2,S} {3,S} {11,S} {12,S}
@@ -688,3 +924,52 @@ class TestFragment(unittest.TestCase):
                                                            clarStructures=True)
 
         self.assertEqual(len(frag_res), 3)
+
+class TestCompactFragment(unittest.TestCase):
+
+    def setUp(self):
+
+        self.fragment = afm.fragment.Fragment(label='RCCCCL').from_SMILES_like_string('RCCCCL')
+        self.compact = afm.fragment.CompactFragment.from_fragment(self.fragment)
+
+    def test_arrays(self):
+
+        # hydrogens are folded into the carbons
+        self.assertEqual(6, len(self.compact))
+        self.assertEqual(8, self.compact.hydrogen_counts.sum())
+        self.assertEqual(len(self.compact) + 1, len(self.compact.indptr))
+        self.assertEqual(2*5, len(self.compact.indices))
+        self.assertEqual(('R', 'L'), tuple(sorted(self.compact.label_names, reverse=True)))
+
+    def test_properties(self):
+
+        self.assertEqual('RCCCCL', self.compact.label)
+        self.assertAlmostEqual(self.fragment.getMolecularWeight(),
+                               self.compact.getMolecularWeight(), 10)
+        self.assertEqual(self.fragment.getFormula(), self.compact.getFormula())
+        self.assertEqual(self.fragment.get_element_count(), self.compact.get_element_count())
+        self.assertEqual(self.fragment.get_cutting_label_count(),
+                         self.compact.get_cutting_label_count())
+        self.assertFalse(self.compact.isRadical())
+
+        radical = afm.fragment.Fragment().from_SMILES_like_string('[CH2]CR')
+        self.assertTrue(afm.fragment.CompactFragment.from_fragment(radical).isRadical())
+
+    def test_canonical_key(self):
+
+        compact = afm.fragment.CompactFragment.from_fragment(self.fragment.copy(deep=True))
+        self.assertEqual(self.fragment.canonical_key, compact.canonical_key)
+
+    def test_to_fragment(self):
+
+        fragment = self.compact.to_fragment()
+        self.assertEqual('RCCCCL', fragment.label)
+        self.assertTrue(self.fragment.isIsomorphic(fragment))
+
+    def test_pickle(self):
+
+        compact = pickle.loads(pickle.dumps(self.compact, -1))
+
+        self.assertEqual(self.compact.label, compact.label)
+        self.assertEqual(self.compact.getFormula(), compact.getFormula())
+        self.assertTrue(self.fragment.isIsomorphic(compact.to_fragment()))
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from rmgpy.molecule.molecule import Molecule
+
+import afm.loader
+import afm.fragment
+import afm.fragmenter
+
+class TestFragmenter(unittest.TestCase):
+
+    def test_cut_molecule1(self):
+
+        # every Cs-Cs bond is cut
+        molecule = Molecule().fromSMILES('CCCC')
+        fragments = afm.fragmenter.cut_molecule(molecule)
+
+        self.assertEqual(4, len(fragments))
+        cutting_label_count = {}
+        for frag in fragments:
+            for name, count in frag.get_cutting_label_count().iteritems():
+                cutting_label_count[name] = cutting_label_count.get(name, 0) + count
+        self.assertEqual({'R': 3, 'L': 3}, cutting_label_count)
+
+        # the molecule is not changed
+        self.assertTrue(molecule.isIsomorphic(Molecule().fromSMILES('CCCC')))
+
+    def test_cut_molecule2(self):
+
+        # aromatic bonds and bonds of other types are not cut
+        molecule = Molecule().fromSMILES('c1ccccc1CC')
+        fragments = afm.fragmenter.cut_molecule(molecule,
+                                                cut_bond_types=[('Cb', 'Cs')],
+                                                label_names=('R', 'R'))
+
+        self.assertEqual(2, len(fragments))
+        expected_keys = set([afm.fragment.Fragment().from_SMILES_like_string('c1ccccc1R').canonical_key,
+                             afm.fragment.Fragment().from_SMILES_like_string('RCC').canonical_key])
+        self.assertEqual(expected_keys, set([frag.canonical_key for frag in fragments]))
+
+    def test_cut_molecule3(self):
+
+        # both sides of a cut keep at least two heavy atoms
+        molecule = Molecule().fromSMILES('CCCCCCC')
+        fragments = afm.fragmenter.cut_molecule(molecule, min_heavy_atoms=2)
+
+        self.assertTrue(len(fragments) > 1)
+        for frag in fragments:
+            self.assertTrue(frag.getNumAtoms('C') >= 2)
+        self.assertEqual(7, sum([frag.getNumAtoms('C') for frag in fragments]))
+
+    def test_fragment_molecules(self):
+
+        fragmenter = afm.fragmenter.Fragmenter(label_names=('R', 'R'))
+        adjlist = Molecule().fromSMILES('CCC').toAdjacencyList()
+        fragment_labels = fragmenter.fragment_molecules([Molecule().fromSMILES('CCCC'), adjlist])
+
+        # fragments are deduplicated: RC and RCR are shared
+        self.assertEqual(2, len(fragmenter))
+        labels_by_key = dict([(frag.canonical_key, label)
+                              for label, frag in fragmenter.get_fragments_dict().iteritems()])
+        label_RC = labels_by_key[afm.fragment.Fragment().from_SMILES_like_string('RC').canonical_key]
+        label_RCR = labels_by_key[afm.fragment.Fragment().from_SMILES_like_string('RCR').canonical_key]
+        self.assertEqual(sorted([label_RC, label_RC, label_RCR, label_RCR]), sorted(fragment_labels[0]))
+        self.assertEqual(sorted([label_RC, label_RC, label_RCR]), sorted(fragment_labels[1]))
+
+        parallel_fragmenter = afm.fragmenter.Fragmenter(label_names=('R', 'R'))
+        parallel_fragment_labels = parallel_fragmenter.fragment_molecules([Molecule().fromSMILES('CCCC'), adjlist],
+                                                                          processes=2)
+        self.assertEqual(fragment_labels, parallel_fragment_labels)
+
+    def test_fragment_labels(self):
+
+        # new fragments get short labels following the label
+        # convention, which skip the labels already in the library
+        frag_F1 = afm.fragment.Fragment(label='F1').from_SMILES_like_string('RCCCCR')
+        fragmenter = afm.fragmenter.Fragmenter(label_names=('R', 'R'), fragments=[frag_F1])
+        fragments = [afm.fragment.Fragment().from_SMILES_like_string('c1ccccc1CCCCCCCCCCCCCCCCR'),
+                     afm.fragment.Fragment().from_SMILES_like_string('RCC[CH2]'),
+                     afm.fragment.Fragment().from_SMILES_like_string('CCCCR')]
+        labels = fragmenter.add_fragments(fragments)
+
+        self.assertEqual(['ArF2', 'F3*', 'F4'], labels)
+        self.assertEqual(['F1'], fragmenter.add_fragments([afm.fragment.Fragment().from_SMILES_like_string('RCCCCR')]))
+
+    def test_save_fragment_smiles(self):
+
+        fragmenter = afm.fragmenter.Fragmenter()
+        fragmenter.fragment_molecule(Molecule().fromSMILES('c1ccccc1CCCC'))
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fragment_smiles_path = os.path.join(temp_dir, 'fragment_smiles.txt')
+            fragmenter.save_fragment_smiles(fragment_smiles_path)
+            fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(sorted(fragmenter.get_fragments_dict().keys()), sorted(fragments_dict.keys()))
+        for label, frag in fragmenter.get_fragments_dict().iteritems():
+            self.assertEqual(frag.canonical_key, fragments_dict[label].canonical_key)
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import afm.utils
+import afm.generator
+
+class TestGenerator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        """A function that is run ONCE before all unit tests in this class."""
+        mini_test_dir = os.path.join(os.path.dirname(__file__),
+                                     os.pardir,
+                                     'examples',
+                                     'pdd_chemistry',
+                                     'mini_test')
+        self.fragment_smiles_path = os.path.join(mini_test_dir, 'fragment_smiles.txt')
+        self.frag_mech_path = os.path.join(mini_test_dir, 'frag_mech.txt')
+        self.database = afm.generator.load_database(families=['R_Recombination'])
+
+    def setUp(self):
+        """
+        A function run before each unit test in this class.
+        """
+        self.output_directory = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """
+        A function run after each unit test in this class.
+        """
+        shutil.rmtree(self.output_directory)
+        shutil.rmtree(self.cache_dir)
+
+    def test_read_frag_mech_by_family(self):
+
+        family_reaction_strings = afm.utils.read_frag_mech_by_family(self.frag_mech_path)
+
+        expected = [('R_Recombination', ['ArC*CCCR + ArC*CCCL == LArArR',
+                                         'ArC*CCCR + ArC*CCCR == RArArR'])]
+        self.assertEqual(expected, family_reaction_strings)
+
+    def test_generate_fragment_mechanism(self):
+
+        mechanism = afm.generator.generate_fragment_mechanism(self.fragment_smiles_path,
+                                                              self.frag_mech_path,
+                                                              self.output_directory,
+                                                              database=self.database)
+
+        self.assertEqual(2, len(mechanism))
+        self.assertEqual(['LArArR', 'RArArR'],
+                         [rxn.products[0].label for rxn in mechanism.reaction_list])
+        for rxn in mechanism.reaction_list:
+            self.assertEqual('R_Recombination', rxn.family)
+            self.assertIsNotNone(rxn.kinetics)
+            for spe in rxn.reactants + rxn.products:
+                self.assertIsNotNone(spe.thermo)
+
+        # forward and reverse fragment reactions
+        fragments_dict, fragment_rxns = mechanism.get_fragment_reactions()
+        self.assertEqual(4, len(fragment_rxns))
+        for rxn in fragment_rxns:
+            for frag in rxn.reactants + rxn.products:
+                self.assertIs(frag, fragments_dict[frag.label])
+
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, 'chem_annotated.inp')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, 'species_dictionary.txt')))
+
+    def test_generate_fragment_mechanism_in_parallel(self):
+
+        # the parallel generation merges the chunks in the order of the file
+        serial_mechanism = afm.generator.generate_fragment_mechanism(self.fragment_smiles_path,
+                                                                     self.frag_mech_path,
+                                                                     self.output_directory,
+                                                                     database=self.database)
+        parallel_mechanism = afm.generator.generate_fragment_mechanism(self.fragment_smiles_path,
+                                                                       self.frag_mech_path,
+                                                                       self.output_directory,
+                                                                       database=self.database,
+                                                                       processes=2,
+                                                                       chunksize=1)
+
+        self.assertEqual([str(rxn) for rxn in serial_mechanism.reaction_list],
+                         [str(rxn) for rxn in parallel_mechanism.reaction_list])
+        for serial_rxn, parallel_rxn in zip(serial_mechanism.reaction_list,
+                                            parallel_mechanism.reaction_list):
+            self.assertAlmostEqual(serial_rxn.kinetics.A.value_si,
+                                   parallel_rxn.kinetics.A.value_si)
+
+    def test_generate_fragment_mechanism_incrementally(self):
+
+        mechanism = afm.generator.generate_fragment_mechanism(self.fragment_smiles_path,
+                                                              self.frag_mech_path,
+                                                              self.output_directory,
+                                                              database=self.database,
+                                                              cache_dir=self.cache_dir)
+        reaction_cache = afm.generator.load_reaction_cache(self.fragment_smiles_path, self.cache_dir)
+        self.assertEqual(2, len(reaction_cache))
+
+        # only the edited line is generated in a rebuild
+        frag_mech_path = os.path.join(self.output_directory, 'frag_mech.txt')
+        with open(frag_mech_path, 'w') as f_out:
+            f_out.write('# Recombinations: R_Recombination\n\n')
+            f_out.write('ArC*CCCR + ArC*CCCR == RArArR\n')
+            f_out.write('ArC*CCCL + ArC*CCCL == LArArL\n')
+
+        new_mechanism = afm.generator.generate_fragment_mechanism(self.fragment_smiles_path,
+                                                                  frag_mech_path,
+                                                                  self.output_directory,
+                                                                  database=self.database,
+                                                                  cache_dir=self.cache_dir)
+        reaction_cache = afm.generator.load_reaction_cache(self.fragment_smiles_path, self.cache_dir)
+        self.assertEqual(3, len(reaction_cache))
+        self.assertEqual(['RArArR', 'LArArL'],
+                         [rxn.products[0].label for rxn in new_mechanism.reaction_list])
+        self.assertAlmostEqual(mechanism.reaction_list[1].kinetics.A.value_si,
+                               new_mechanism.reaction_list[0].kinetics.A.value_si)
+
+        # the species restored from the caches keep their labels and thermo
+        self.assertEqual([spe.label for spe in mechanism.species_list],
+                         [spe.label for spe in new_mechanism.species_list])
+        for spe, new_spe in zip(mechanism.species_list, new_mechanism.species_list):
+            self.assertIsNotNone(new_spe.thermo)
+            self.assertAlmostEqual(spe.thermo.getEnthalpy(298), new_spe.thermo.getEnthalpy(298), 6)
+            self.assertAlmostEqual(spe.thermo.getEntropy(298), new_spe.thermo.getEntropy(298), 6)
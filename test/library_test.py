@@ -0,0 +1,153 @@
+import os
+import unittest
+
+import afm.loader
+import afm.library
+import afm.fragment
+
+class TestFragmentPropertyTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        """A function that is run ONCE before all unit tests in this class."""
+        fragment_smiles_path = os.path.join(os.path.dirname(__file__),
+                                    'data',
+                                    'loader_data',
+                                    'fragment_smiles.txt')
+
+        self.fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+        self.property_table = afm.library.get_property_table(self.fragments_dict)
+
+    def test_table_is_shared(self):
+
+        self.assertEqual(40, len(self.property_table))
+        for label, frag in self.fragments_dict.iteritems():
+            self.assertIs(self.property_table, frag.property_table)
+            self.assertEqual(label, self.property_table.labels[frag.library_id])
+
+    def test_molecular_weights(self):
+
+        frag = self.fragments_dict['RCCCCR']
+        frag_id = self.property_table.get_id('RCCCCR')
+        self.assertAlmostEqual(self.property_table.molecular_weights[frag_id]*1000, 56.11, 2)
+        self.assertAlmostEqual(frag.getMolecularWeight()*1000, 56.11, 2)
+
+        total_weights = self.property_table.get_total_weights([('RCCCCR',),
+                                                               ('RCCCCR', 'RCCCCR')])
+        self.assertAlmostEqual(total_weights[1], 2*total_weights[0], 10)
+
+    def test_label_counts_and_radical_flags(self):
+
+        frag_id = self.property_table.get_id('RCCCCR')
+        self.assertEqual(2, self.property_table.r_counts[frag_id])
+        self.assertEqual(0, self.property_table.l_counts[frag_id])
+        self.assertFalse(self.property_table.radical_flags[frag_id])
+
+        frag_id = self.property_table.get_id('RCC*')
+        self.assertEqual(1, self.property_table.r_counts[frag_id])
+        self.assertTrue(self.property_table.radical_flags[frag_id])
+        self.assertEqual(1, self.property_table.radical_counts[frag_id])
+
+    def test_element_count_and_formula(self):
+
+        frag = self.fragments_dict['RCCCCR']
+        self.assertEqual({'C': 4, 'H': 8}, frag.get_element_count())
+        self.assertEqual('C4H8R2', frag.getFormula())
+
+    def test_table_detached_after_update(self):
+
+        frag = afm.fragment.Fragment(label='RCR').from_SMILES_like_string('RCR')
+        afm.library.FragmentPropertyTable([frag])
+        self.assertEqual(0, frag.library_id)
+
+        frag.update()
+        self.assertIsNone(frag.property_table)
+        self.assertAlmostEqual(frag.getMolecularWeight()*1000, 14.03, 2)
+
+    def test_get_property_table_keeps_attached_ids(self):
+
+        # a table of a subset of the fragments does not take them over
+        labels = sorted(self.fragments_dict.keys())[:3]
+        fragments_dict = dict([(label, self.fragments_dict[label]) for label in labels])
+        library_ids = [self.fragments_dict[label].library_id for label in labels]
+        property_table = afm.library.get_property_table(fragments_dict)
+
+        self.assertIsNot(self.property_table, property_table)
+        self.assertEqual(labels, property_table.labels)
+        for label, library_id in zip(labels, library_ids):
+            frag = self.fragments_dict[label]
+            self.assertIs(self.property_table, frag.property_table)
+            self.assertEqual(library_id, frag.library_id)
+            self.assertEqual(label, self.property_table.labels[frag.library_id])
+
+class TestFragmentLibrary(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        """A function that is run ONCE before all unit tests in this class."""
+        fragment_smiles_path = os.path.join(os.path.dirname(__file__),
+                                    'data',
+                                    'loader_data',
+                                    'fragment_smiles.txt')
+
+        self.fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+        self.library = afm.library.FragmentLibrary.from_fragments_dict(self.fragments_dict)
+
+    def test_label_lookup(self):
+
+        self.assertEqual(40, len(self.library))
+        self.assertIn('RCCCCR', self.library)
+        self.assertIs(self.fragments_dict['RCCCCR'], self.library['RCCCCR'])
+        self.assertEqual(self.fragments_dict['RCCCCR'].library_id, self.library.get_id('RCCCCR'))
+
+    def test_formula_and_label_signature(self):
+
+        frag_ids = self.library.get_ids_by_formula('C4H8R2')
+        self.assertEqual(['RCCCCR'], [self.library.fragments[frag_id].label for frag_id in frag_ids])
+
+        frag_ids = self.library.get_ids_by_label_signature(2, 0)
+        labels = [frag.label for frag in self.library.get_fragments(frag_ids)]
+        self.assertIn('RCCCCR', labels)
+        self.assertIn('RCC*CCR', labels)
+        self.assertNotIn('RCC', labels)
+        self.assertEqual([], self.library.get_ids_by_formula('C100'))
+
+    def test_weight_range(self):
+
+        weights = self.library.property_table.molecular_weights
+        frag_ids = self.library.get_ids_in_weight_range(0.02, 0.06)
+        self.assertTrue(len(frag_ids) > 0)
+        self.assertTrue(((weights[frag_ids] >= 0.02) & (weights[frag_ids] <= 0.06)).all())
+        self.assertEqual(((weights >= 0.02) & (weights <= 0.06)).sum(), len(frag_ids))
+
+        bins = self.library.get_weight_bins([0.02, 0.06])
+        self.assertEqual(len(self.library), len(bins))
+        self.assertEqual(frag_ids.size, (bins == 1).sum() + (weights == 0.06).sum())
+
+    def test_find(self):
+
+        frag = afm.fragment.Fragment(label='new').from_SMILES_like_string('RCCCCR')
+        self.assertEqual(self.library.get_id('RCCCCR'), self.library.find(frag))
+
+        frag = afm.fragment.Fragment(label='new').from_SMILES_like_string('RCCCCCCCCR')
+        self.assertIsNone(self.library.find(frag))
+
+    def test_find_substructure_matches(self):
+
+        from rmgpy.molecule.group import Group
+
+        adj = """
+1 * R u1
+"""
+        group = Group().fromAdjacencyList(adj)
+
+        mask = self.library.get_substructure_mask(group)
+        radical_labels = [frag.label for frag in self.library if frag.isRadical()]
+        self.assertEqual(len(radical_labels), mask.sum())
+
+        frag_ids = self.library.find_substructure_matches(group)
+        self.assertEqual(sorted(radical_labels),
+                         sorted([self.library.fragments[frag_id].label for frag_id in frag_ids]))
+
+        parallel_frag_ids = self.library.find_substructure_matches(group, processes=2)
+        self.assertEqual(frag_ids, parallel_frag_ids)
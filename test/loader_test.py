@@ -1,7 +1,12 @@
 import os
+import shutil
+import tempfile
 import unittest
 
+import afm.utils
 import afm.loader
+import afm.reaction
+import afm.fragment
 
 class TestLoader(unittest.TestCase):
 
@@ -29,7 +34,7 @@ class TestLoader(unittest.TestCase):
 		self.assertEqual(40, len(fragments_dict))
 		self.assertEqual(312, len(fragment_rxns))
 
-	def test_load_pseudo_fragment_reactions(self):
+	def test_lazy_reverse_kinetics(self):
 
 		chemkin_path = os.path.join(os.path.dirname(__file__), 
 									'data', 
@@ -46,16 +51,100 @@ class TestLoader(unittest.TestCase):
 									'loader_data',
 									'fragment_smiles.txt')
 
-		fragments_dict, _ = afm.loader.load_fragment_reactions_from_chemkin(chemkin_path,
-                                        									dictionary_path,
-                                        									fragment_smiles_path)
+		_, fragment_rxns = afm.loader.load_fragment_reactions_from_chemkin(chemkin_path,
+																		   dictionary_path,
+																		   fragment_smiles_path)
+		revs_fragrxn = fragment_rxns[-1]
+		rxn0 = revs_fragrxn.reverse_of
+		self.assertIsNone(revs_fragrxn._kinetics)
 
-		pseudo_fragrxns = afm.loader.load_pseudo_fragment_reactions(fragments_dict)
+		# the reverse kinetics are fitted on first access
+		revs_kinetics = revs_fragrxn.kinetics
+		self.assertIsNotNone(revs_kinetics)
+		self.assertIs(revs_kinetics, revs_fragrxn.kinetics)
+
+		T = 700
+		k = afm.reaction.get_rate_coefficients(fragment_rxns, T)[-1]
+		self.assertEqual(revs_kinetics.getRateCoefficient(T), k)
+		expected_k = rxn0.getRateCoefficient(T)/rxn0.getEquilibriumConstant(T)
+		self.assertAlmostEqual(1.0, k/expected_k, 2)
+
+	def test_load_fragments(self):
+
+		fragment_smiles_path = os.path.join(os.path.dirname(__file__), 
+									'data', 
+									'loader_data',
+									'fragment_smiles.txt')
+
+		fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+
+		self.assertEqual(40, len(fragments_dict))
+		self.assertEqual('RCCCCR', fragments_dict['RCCCCR'].species_repr.label)
+
+	def test_load_fragments_in_parallel(self):
+
+		fragment_smiles_path = os.path.join(os.path.dirname(__file__), 
+									'data', 
+									'loader_data',
+									'fragment_smiles.txt')
+
+		fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+		parallel_fragments_dict = afm.loader.load_fragments(fragment_smiles_path, processes=2)
+
+		self.assertEqual(sorted(fragments_dict.keys()), sorted(parallel_fragments_dict.keys()))
+		for label, frag in fragments_dict.iteritems():
+			parallel_frag = parallel_fragments_dict[label]
+			self.assertTrue(frag.isIsomorphic(parallel_frag))
+			self.assertEqual(frag.library_id, parallel_frag.library_id)
+
+	def test_load_fragments_compact(self):
+
+		fragment_smiles_path = os.path.join(os.path.dirname(__file__), 
+									'data', 
+									'loader_data',
+									'fragment_smiles.txt')
+
+		fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+		compact_fragments_dict = afm.loader.load_fragments(fragment_smiles_path, compact=True)
+
+		self.assertEqual(sorted(fragments_dict.keys()), sorted(compact_fragments_dict.keys()))
+		for label, frag in fragments_dict.iteritems():
+			compact_frag = compact_fragments_dict[label]
+			self.assertIsInstance(compact_frag, afm.fragment.CompactFragment)
+			self.assertEqual(frag.library_id, compact_frag.library_id)
+			self.assertAlmostEqual(frag.getMolecularWeight(), compact_frag.getMolecularWeight(), 10)
+
+	def test_load_fragments_isomorphic_duplicate(self):
+
+		temp_dir = tempfile.mkdtemp()
+		try:
+			fragment_smiles_path = os.path.join(temp_dir, 'fragment_smiles.txt')
+			with open(fragment_smiles_path, 'w') as f_out:
+				f_out.write('RCCL: RCCL\n')
+				f_out.write('RCC: RCC\n')
+				f_out.write('LCCR: LCCR\n')
+
+			self.assertRaises(Exception, afm.loader.load_fragments, fragment_smiles_path)
+		finally:
+			shutil.rmtree(temp_dir)
+
+	def test_get_pseudo_fragment_reactions(self):
+
+		fragment_smiles_path = os.path.join(os.path.dirname(__file__), 
+									'data', 
+									'loader_data',
+									'fragment_smiles.txt')
+
+		fragments_dict = afm.loader.load_fragments(fragment_smiles_path)
+		pseudo_reactions = [afm.utils.parse_pseudo_reaction_string('RC*C__C + RCCCCR == RCCCCC__CC*')]
+		pseudo_fragrxns = afm.loader.get_pseudo_fragment_reactions(pseudo_reactions, fragments_dict)
 
-		# currently only one reaction is added as
-		# pseudo reaction
 		self.assertEqual(1, len(pseudo_fragrxns))
 
 		pseudo_fragrxn = pseudo_fragrxns[0]
 
 		self.assertEqual('pseudo_rxn', pseudo_fragrxn.family)
+		self.assertEqual(['RC*C__C', 'RCCCCR'], [frag.label for frag in pseudo_fragrxn.reactants])
+		self.assertEqual(['RCCCCC__CC*'], [frag.label for frag in pseudo_fragrxn.products])
+		# the default rate of bimolecular pseudo reactions
+		self.assertAlmostEqual(2.0e+05, pseudo_fragrxn.kinetics.A.value_si*1e6)
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import rmgpy.constants
+
+import afm.mechanism
+
+class TestFragmentReactionNetwork(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        """A function that is run ONCE before all unit tests in this class."""
+        chemkin_path = os.path.join(os.path.dirname(__file__),
+                                    'data',
+                                    'mc_simulator_data',
+                                    'chem.inp')
+
+        dictionary_path = os.path.join(os.path.dirname(__file__),
+                                    'data',
+                                    'mc_simulator_data',
+                                    'species_dictionary.txt')
+
+        fragment_smiles_path = os.path.join(os.path.dirname(__file__),
+                                    'data',
+                                    'mc_simulator_data',
+                                    'fragment_smiles.txt')
+
+        self.mechanism = afm.mechanism.load_fragment_mechanism(chemkin_path,
+                                                               dictionary_path,
+                                                               fragment_smiles_path)
+        self.network = self.mechanism.get_reaction_network()
+        _, self.fragment_rxns = self.mechanism.get_fragment_reactions()
+
+    def test_structure(self):
+
+        self.assertEqual(len(self.fragment_rxns), len(self.network))
+        self.assertIs(self.network, self.mechanism.get_reaction_network())
+
+        num_fragments = len(self.mechanism.fragments_dict)
+        self.assertEqual((num_fragments, len(self.network)), self.network.stoichiometry.shape)
+
+        for rxn_idx, frag_rxn in enumerate(self.fragment_rxns):
+            self.assertEqual(len(frag_rxn.reactants), self.network.molecularity[rxn_idx])
+
+            reactant_labels = [self.network.labels[frag_id]
+                               for frag_id in self.network.reactant_ids[rxn_idx] if frag_id >= 0]
+            self.assertEqual([reactant.label for reactant in frag_rxn.reactants], reactant_labels)
+
+            expected_column = np.zeros(num_fragments)
+            for reactant in frag_rxn.reactants:
+                expected_column[self.network.label_to_id[reactant.label]] -= 1
+            for product in frag_rxn.products:
+                expected_column[self.network.label_to_id[product.label]] += 1
+            column = self.network.stoichiometry[:, rxn_idx].toarray().ravel()
+            self.assertTrue(np.array_equal(expected_column, column))
+
+    def test_get_propensities(self):
+
+        T = 700 # unit: K
+        volume = 4.8e-25 # unit: m^3
+        count_dict = dict([(label, idx + 1) for idx, label in enumerate(self.network.labels)])
+        counts = self.network.get_count_array(count_dict)
+        self.assertEqual(count_dict, self.network.get_count_dict(counts))
+
+        propensities = self.network.get_propensities(counts, T, volume)
+        for rxn_idx, frag_rxn in enumerate(self.fragment_rxns):
+            rate = frag_rxn.kinetics.getRateCoefficient(T)
+            if len(frag_rxn.reactants) == 2:
+                rate /= rmgpy.constants.Na * volume
+            for reactant in frag_rxn.reactants:
+                rate *= count_dict[reactant.label]
+            self.assertAlmostEqual(1.0, propensities[rxn_idx]/rate, 10)
+
+    def test_get_rhs(self):
+
+        T = 700 # unit: K
+        concentrations = np.linspace(1.0, 2.0, len(self.network.labels))
+        rates = self.network.get_rates(concentrations, T)
+        rhs = self.network.get_rhs(concentrations, T)
+
+        expected_rhs = np.zeros(len(self.network.labels))
+        for rate, frag_rxn in zip(rates, self.fragment_rxns):
+            for reactant in frag_rxn.reactants:
+                expected_rhs[self.network.label_to_id[reactant.label]] -= rate
+            for product in frag_rxn.products:
+                expected_rhs[self.network.label_to_id[product.label]] += rate
+
+        self.assertTrue(np.allclose(expected_rhs, rhs))
+
+    def test_pseudo_reactions(self):
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            pseudo_rxn_path = os.path.join(temp_dir, 'pseudo_rxn.txt')
+            with open(pseudo_rxn_path, 'w') as f_out:
+                f_out.write('# Pseudo-reactions\n\n')
+                f_out.write('RC* + RCCCCR == RCCCCC*\n')
+                f_out.write('RCC == RC + 0.25 RCCCCR  1.0e+03 0.0 10.0\n')
+
+            mechanism = self.mechanism.with_pseudo_reactions(pseudo_rxn_path)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        network = mechanism.get_reaction_network()
+        self.assertEqual(len(self.network) + 2, len(network))
+        # the mechanism the pseudo reactions are added to is not changed
+        self.assertEqual(len(self.fragment_rxns), len(self.network))
+
+        label_to_id = network.label_to_id
+        column = network.stoichiometry[:, len(network) - 1].toarray().ravel()
+        self.assertEqual(-1.0, column[label_to_id['RCC']])
+        self.assertEqual(1.0, column[label_to_id['RC']])
+        self.assertEqual(0.25, column[label_to_id['RCCCCR']])
+        self.assertEqual(1, network.molecularity[-1])
+        self.assertEqual(2, network.molecularity[-2])
+
+        # fractional products are conserved in the right-hand side
+        T = 700 # unit: K
+        concentrations = np.zeros(len(network.labels))
+        concentrations[label_to_id['RCC']] = 1.0
+        rhs = network.get_rhs(concentrations, T)
+        self.assertAlmostEqual(0.25*rhs[label_to_id['RC']], rhs[label_to_id['RCCCCR']])
+        self.assertAlmostEqual(-rhs[label_to_id['RCC']], rhs[label_to_id['RC']])
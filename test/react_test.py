@@ -4,6 +4,7 @@ import unittest
 from rmgpy import settings
 from rmgpy.species import Species
 from rmgpy.data.rmg import RMGDatabase
+from rmgpy.molecule.graph import Graph
 
 import afm.react
 import afm.fragment
@@ -52,6 +53,55 @@ class TestReact(unittest.TestCase):
 
         self.assertTrue(len(reactions)==11)
 
+    def get_reaction_keys(self, reactions):
+
+        return sorted([(rxn.family,
+                        sorted([reactant.toSMILES() for reactant in rxn.reactants]),
+                        sorted([product.toSMILES() for product in rxn.products]))
+                       for rxn in reactions])
+
+    def test_react_fragments3(self):
+
+        # the prefilter does not change the generated reactions
+        for smiles_like_strings, family in [(('c1ccccc1CCCR',), 'R_Recombination'),
+                                            (('c1ccccc1CCCR', '[CH2]CR'), 'H_Abstraction')]:
+            reaction_keys = []
+            for prefilter in (True, False):
+                fragment_tuple = tuple([afm.fragment.Fragment(label='frag{0}'.format(idx)).from_SMILES_like_string(string)
+                                        for idx, string in enumerate(smiles_like_strings)])
+                reactions = afm.react.react_fragments(self.database.kinetics,
+                                                      fragment_tuple,
+                                                      only_families=[family],
+                                                      prod_resonance=False,
+                                                      prefilter=prefilter)
+                reaction_keys.append(self.get_reaction_keys(reactions))
+
+            self.assertTrue(len(reaction_keys[0]) > 0)
+            self.assertEqual(reaction_keys[0], reaction_keys[1])
+        self.assertIsNone(afm.fragment.group_prefilter_index)
+
+    def test_group_prefilter_index(self):
+
+        index = afm.react.GroupPrefilterIndex.from_kinetics_database(self.database.kinetics)
+        frag1 = afm.fragment.Fragment(label='frag1').from_SMILES_like_string('c1ccccc1CCCR')
+        mask = index.get_mask(frag1)
+
+        self.assertEqual(len(index), len(mask))
+        for group, may_match in zip(index.groups, mask):
+            # closed shell fragment can not match radical groups
+            if group.radicalCount > 0:
+                self.assertFalse(may_match)
+            # the prefilter never rejects a matching group, checked
+            # on the representative molecule without the prefilter
+            if not may_match:
+                frag1.assign_representative_molecule()
+                self.assertFalse(Graph.isSubgraphIsomorphic(frag1.mol_repr, group, None))
+
+        # the mask is memoized on the fragment until it is changed
+        self.assertIs(mask, index.get_mask(frag1))
+        frag1.resetCachedStructureInfo()
+        self.assertIsNone(frag1._prefilter_mask)
+
     def test_generate_reactions_from_families1(self):
 
         frag1 = afm.fragment.Fragment(label='frag1').from_SMILES_like_string('CC')
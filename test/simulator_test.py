@@ -1,9 +1,13 @@
 import os
 import shutil
+import tempfile
 import unittest
 
+import numpy as np
+
 import afm.utils
 import afm.simulator
+import afm.mechanism
 import afm.molecule
 
 class TestSimulator(unittest.TestCase):
@@ -30,6 +34,11 @@ class TestSimulator(unittest.TestCase):
                                                 dictionary_path,
                                                 fragment_smiles_path)
 
+        self.mechanism = afm.mechanism.load_fragment_mechanism(chemkin_path,
+                                                               dictionary_path,
+                                                               fragment_smiles_path)
+        self.simulator_paths = (chemkin_path, dictionary_path, fragment_smiles_path)
+
     def test_fragment_chemistry(self):
 
         fragment_dict = self.simulator.fragment_dict
@@ -39,6 +48,54 @@ class TestSimulator(unittest.TestCase):
         # change from 5 to 4 due to no pseudo fragment rxn
         self.assertEqual(4, len(fragment_reaction_list))
 
+    def test_fragment_chemistry_from_mechanism(self):
+
+        # the paths are not used with an in-memory mechanism
+        simulator = afm.simulator.Simulator(None, None, None, mechanism=self.mechanism)
+
+        self.assertIs(self.mechanism, simulator.mechanism)
+        self.assertEqual(self.mechanism.fragments_dict, simulator.fragment_dict)
+        self.assertEqual([str(rxn) for rxn in self.simulator.fragment_reaction_list],
+                         [str(rxn) for rxn in simulator.fragment_reaction_list])
+
+    def test_fragment_chemistry_with_pseudo_reactions(self):
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            pseudo_rxn_path = os.path.join(temp_dir, 'pseudo_rxn.txt')
+            with open(pseudo_rxn_path, 'w') as f_out:
+                f_out.write('RC*C__C + RCCCCR == RCCCCC__CC*\n')
+
+            simulator = afm.simulator.Simulator(*self.simulator_paths, pseudo_rxn_path=pseudo_rxn_path)
+            simulator1 = afm.simulator.Simulator(*self.simulator_paths, pseudo_rxn_path=pseudo_rxn_path)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        # the pseudo reaction is appended to the fragment reactions
+        self.assertEqual(len(self.simulator.fragment_reaction_list) + 1, len(simulator.fragment_reaction_list))
+        self.assertEqual('pseudo_rxn', simulator.fragment_reaction_list[-1].family)
+        self.assertEqual(len(simulator.fragment_reaction_list), len(simulator.network))
+
+        # the pseudo reaction file is part of the key of the shared mechanism
+        self.assertIsNot(self.simulator.mechanism, simulator.mechanism)
+        self.assertIs(simulator.mechanism, simulator1.mechanism)
+
+    def test_shared_fragment_chemistry(self):
+
+        # simulators on the same files share one parsed mechanism
+        simulator = afm.simulator.Simulator(*self.simulator_paths)
+
+        self.assertIs(self.simulator.mechanism, simulator.mechanism)
+        self.assertIs(self.simulator.network, simulator.network)
+        self.assertIsNot(self.mechanism, simulator.mechanism)
+
+        # the reactions are those of the network and cannot be changed,
+        # while the fragment dictionary is copied per simulator
+        self.assertIs(simulator.network.fragment_reactions, simulator.fragment_reaction_list)
+        self.assertRaises(AttributeError, getattr, simulator.fragment_reaction_list, 'pop')
+        self.assertEqual(len(simulator.network), len(simulator.fragment_reaction_list))
+        self.assertIsNot(self.simulator.fragment_dict, simulator.fragment_dict)
+
 class TestOdeSimulator(unittest.TestCase):
 
     @classmethod
@@ -334,6 +391,26 @@ class TestMonteCarloSimulator(unittest.TestCase):
 
         self.mcs.update_reaction_fluxes()
 
+    def test_fractional_products(self):
+
+        # fractional products are rejected by the Monte Carlo simulation
+        temp_dir = tempfile.mkdtemp()
+        try:
+            pseudo_rxn_path = os.path.join(temp_dir, 'pseudo_rxn.txt')
+            with open(pseudo_rxn_path, 'w') as f_out:
+                f_out.write('RCC == RC + 0.25 RCCCCR  1.0e+03 0.0 10.0\n')
+
+            self.assertRaises(Exception,
+                              afm.simulator.MonteCarloSimulator,
+                              None, None, None,
+                              [afm.molecule.FragmentMolecule({'ArCCCCR': 1})],
+                              4.8e-25,
+                              700,
+                              mechanism=self.mcs.mechanism,
+                              pseudo_rxn_path=pseudo_rxn_path)
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_initialize_fragment_counts(self):
 
         # test all thre fragment labels are in the 
@@ -403,3 +480,20 @@ class TestMonteCarloSimulator(unittest.TestCase):
         self.assertEqual(self.mcs.fragment_count_dict['ArC__C'], 9)
         self.assertEqual(self.mcs.fragment_count_dict['ArC*CCCR'], 1)
         self.assertEqual(self.mcs.fragment_count_dict['ArC*C'], 1)
+
+        # the counts are integers, and the count dictionary
+        # is a live view of the count array
+        label_to_id = self.mcs.network.label_to_id
+        self.assertTrue(np.issubdtype(self.mcs.fragment_count_array.dtype, np.integer))
+        self.assertIsInstance(self.mcs.fragment_count_dict['ArCCCCR'], (int, long))
+        self.assertEqual(999, self.mcs.fragment_count_array[label_to_id['ArCCCCR']])
+
+        self.mcs.fragment_count_dict['ArCCCCR'] -= 1
+        self.assertEqual(998, self.mcs.fragment_count_array[label_to_id['ArCCCCR']])
+
+        # assigning a dictionary replaces all the counts
+        count_dict = dict(self.mcs.fragment_count_dict)
+        count_dict['ArCCCCR'] = 997
+        self.mcs.fragment_count_dict = count_dict
+        self.assertEqual(997, self.mcs.fragment_count_array[label_to_id['ArCCCCR']])
+        self.assertEqual(count_dict, dict(self.mcs.fragment_count_dict))
@@ -0,0 +1,81 @@
+import os
+import math
+import shutil
+import tempfile
+import unittest
+
+import rmgpy.constants as constants
+from rmgpy import settings
+from rmgpy.data.rmg import RMGDatabase
+
+import afm.thermo
+import afm.fragment
+
+class TestFragmentThermoCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        """A function that is run ONCE before all unit tests in this class."""
+        db_path = settings['database.directory']
+        self.database = RMGDatabase()
+        self.database.loadThermo(os.path.join(db_path, 'thermo'),
+                                 thermoLibraries=['primaryThermoLibrary'])
+
+    def setUp(self):
+        """
+        A function run before each unit test in this class.
+        """
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """
+        A function run after each unit test in this class.
+        """
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_thermo(self):
+
+        thermo_cache = afm.thermo.FragmentThermoCache(self.database.thermo)
+        frag = afm.fragment.Fragment(label='RCCCCR').from_SMILES_like_string('RCCCCR')
+        thermo = thermo_cache.get_thermo(frag)
+        self.assertEqual(1, thermo_cache.misses)
+
+        # an isomorphic fragment with the same label hits the cache
+        frag1 = afm.fragment.Fragment(label='RCCCCR').from_SMILES_like_string('RCCCCR')
+        self.assertIs(thermo, thermo_cache.get_thermo(frag1))
+        self.assertEqual(1, thermo_cache.hits)
+
+        # the entropy correction only applies to the listed labels
+        frag2 = afm.fragment.Fragment(label='frag2').from_SMILES_like_string('RCCCCR')
+        thermo2 = thermo_cache.get_thermo(frag2)
+        self.assertEqual(2, thermo_cache.misses)
+        self.assertAlmostEqual(thermo.getEntropy(298) - thermo2.getEntropy(298),
+                               constants.R * math.log(2), delta=0.1)
+
+    def test_persistence(self):
+
+        fragment_smiles_path = os.path.join(self.cache_dir, 'fragment_smiles.txt')
+        with open(fragment_smiles_path, 'w') as f_out:
+            f_out.write('RCC: RCC\n')
+        frag = afm.fragment.Fragment(label='RCC').from_SMILES_like_string('RCC')
+
+        thermo_cache = afm.thermo.load_thermo_cache(fragment_smiles_path, self.cache_dir, self.database.thermo,
+                                                    database_version='version1')
+        thermo_cache.assign_thermo([frag])
+        afm.thermo.save_thermo_cache(fragment_smiles_path, self.cache_dir, thermo_cache)
+
+        thermo_cache = afm.thermo.load_thermo_cache(fragment_smiles_path, self.cache_dir, self.database.thermo,
+                                                    database_version='version1')
+        self.assertEqual(1, len(thermo_cache))
+        self.assertTrue(frag in thermo_cache)
+        thermo = thermo_cache.get_thermo(frag)
+        self.assertEqual(1, thermo_cache.hits)
+        self.assertAlmostEqual(frag.species_repr.thermo.getEnthalpy(298), thermo.getEnthalpy(298), 6)
+
+        # the thermo of another database version, e.g., other
+        # thermo libraries, is estimated again
+        thermo_cache = afm.thermo.load_thermo_cache(fragment_smiles_path, self.cache_dir, self.database.thermo,
+                                                    database_version='version2')
+        self.assertFalse(frag in thermo_cache)
+        thermo_cache.get_thermo(frag)
+        self.assertEqual(1, thermo_cache.misses)
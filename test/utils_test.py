@@ -1,3 +1,4 @@
+import os
 import unittest
 
 import afm.utils
@@ -243,3 +244,30 @@ class TestUtils(unittest.TestCase):
 
 		self.assertEqual(new_matches_1_label, expected_new_matches_1_label)
 		self.assertEqual(new_r_l_moles_1_label, expected_new_r_l_moles_1_label)
+
+	def test_parse_pseudo_reaction_string(self):
+
+		reactants, products, arrhenius = afm.utils.parse_pseudo_reaction_string('RCC == RC + 0.25 RCCCCR')
+
+		self.assertEqual([(1.0, 'RCC')], reactants)
+		self.assertEqual([(1.0, 'RC'), (0.25, 'RCCCCR')], products)
+		self.assertIsNone(arrhenius)
+
+		reactants, products, arrhenius = afm.utils.parse_pseudo_reaction_string('RC* + RCCCCR == RCCCCC*  1.0e+11 0.0 2.5')
+
+		self.assertEqual([(1.0, 'RC*'), (1.0, 'RCCCCR')], reactants)
+		self.assertEqual([(1.0, 'RCCCCC*')], products)
+		self.assertEqual((1.0e+11, 0.0, 2.5), arrhenius)
+
+	def test_read_pseudo_rxn(self):
+
+		# the common pseudo reaction file is a template whose rules are
+		# all commented out, see common_rules/README
+		pseudo_rxn_path = os.path.join(os.path.dirname(__file__),
+									   os.pardir,
+									   'examples',
+									   'pdd_chemistry',
+									   'common_rules',
+									   'pseudo_rxn.txt')
+
+		self.assertEqual([], afm.utils.read_pseudo_rxn(pseudo_rxn_path))